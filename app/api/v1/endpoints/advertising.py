@@ -1,81 +1,27 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import advertising_schemas as schemas
-from app.core import database
+from app.core import database, events, json_codec
 from app.models import models
-from app.services import research_service, ad_generation_service
-from app.services.facebook_marketing_service import FacebookMarketingService, create_facebook_ad_from_generated_image
+from app.services import research_service, ad_generation_service, ad_status_service, generation_pool, session_store, storage_service
+from app.services.facebook_marketing_service import create_facebook_ad_from_generated_image
 import uuid
 import asyncio
-import json
-from datetime import datetime
+from contextlib import AsyncExitStack
+from typing import List, Optional
 
 
-async def simulate_image_generation(job_ids: list):
-    """Generate images using AI based on the prompts"""
-    await asyncio.sleep(2)  # Small delay before processing
-    
-    from app.core.database import SessionLocal
-    from app.services import image_generation_service
-    db = SessionLocal()
-    
-    try:
-        for job_id in job_ids:
-            job = db.query(models.GenerationJob).filter(models.GenerationJob.id == job_id).first()
-            if job:
-                try:
-                    # Update job status to processing
-                    job.status = models.JobStatus.PROCESSING
-                    db.commit()
-                    
-                    # Get session to access research data
-                    session = db.query(models.Session).filter(models.Session.id == job.session_id).first()
-                    research_data = json.loads(session.trend_data) if session and session.trend_data else {}
-                    
-                    # Generate the actual image using AI
-                    result = image_generation_service.generate_image(
-                        prompt=job.prompt_used,
-                        style_params={
-                            "style": "professional advertisement",
-                            "mood": "engaging"
-                        },
-                        research_data=research_data
-                    )
-                    
-                    # Update job status to completed
-                    job.status = models.JobStatus.COMPLETED
-                    job.completed_at = datetime.utcnow()
-                    
-                    # Create the generated image record
-                    image = models.GeneratedImage(
-                        id=str(uuid.uuid4()),
-                        session_id=job.session_id,
-                        job_id=job_id,
-                        image_url=result["url"],
-                        thumbnail_url=result["thumbnail_url"],
-                        prompt_used=job.prompt_used,
-                        analysis=json.dumps(result["analysis"]),
-                        image_metadata=json.dumps(result["metadata"])
-                    )
-                    db.add(image)
-                    
-                except Exception as e:
-                    # If image generation fails, update job with error
-                    job.status = models.JobStatus.FAILED
-                    job.error_message = str(e)
-                    job.completed_at = datetime.utcnow()
-        
-        db.commit()
-    finally:
-        db.close()
-
 router = APIRouter()
 
+STREAM_KEEPALIVE_SECONDS = 15
+
 
 @router.post("/product-info", response_model=schemas.ProductInfoResponse)
 async def submit_product_info(
     payload: schemas.ProductInfoRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Step 1: Collect initial product information"""
     # Validate offer details if focus is offer
@@ -91,16 +37,14 @@ async def submit_product_info(
     if 'advertising_focus' in payload_dict:
         payload_dict['advertising_focus'] = payload_dict['advertising_focus'].value if hasattr(payload_dict['advertising_focus'], 'value') else str(payload_dict['advertising_focus'])
     
-    import json
-    
     session = models.Session(
         id=session_id,
         initial_prompt=f"{payload.company_name} - {payload.product_type}",
-        extracted_keywords=json.dumps([payload.product_type, payload.company_name]),
-        refined_prompt=json.dumps(payload_dict)
+        extracted_keywords=json_codec.dumps([payload.product_type, payload.company_name])
     )
     db.add(session)
-    db.commit()
+    await session_store.save_product_info(db, session_id, payload_dict)
+    await db.commit()
     
     return schemas.ProductInfoResponse(
         session_id=session_id,
@@ -112,16 +56,15 @@ async def submit_product_info(
 @router.post("/research", response_model=schemas.ResearchResponse)
 async def conduct_research(
     payload: schemas.ResearchRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Step 2: Research trends and gather insights"""
     # Get session
-    session = db.query(models.Session).filter(models.Session.id == payload.session_id).first()
+    session = await db.get(models.Session, payload.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Parse JSON string back to dict
-    product_info = json.loads(session.refined_prompt) if session.refined_prompt else {}
+    product_info = await session_store.get_product_info(db, session.id)
     
     # Conduct research
     research_data = await research_service.conduct_comprehensive_research(
@@ -129,9 +72,9 @@ async def conduct_research(
         website_url=str(payload.company_website) if payload.company_website else None
     )
     
-    # Store research data as JSON string
-    session.trend_data = json.dumps(research_data)
-    db.commit()
+    # Store research data, one row per section
+    await session_store.save_research(db, session.id, research_data)
+    await db.commit()
     
     # Create summary
     summary = research_service.create_research_summary(research_data)
@@ -145,17 +88,17 @@ async def conduct_research(
 @router.post("/generate-ideas", response_model=schemas.GenerateIdeasResponse)
 async def generate_ad_ideas(
     payload: schemas.GenerateIdeasRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Step 3 & 4: Generate ad ideas based on research and user preferences"""
     # Get session
-    session = db.query(models.Session).filter(models.Session.id == payload.session_id).first()
+    session = await db.get(models.Session, payload.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Parse JSON data for services
-    product_info = json.loads(session.refined_prompt) if session.refined_prompt else {}
-    research_data = json.loads(session.trend_data) if session.trend_data else {}
+    # Load only the research sections idea generation uses
+    product_info = await session_store.get_product_info(db, session.id)
+    research_data = await session_store.get_research(db, session.id, ["market_trends", "competitor_analysis"])
     
     # Generate ideas
     ideas = ad_generation_service.generate_ad_ideas(
@@ -164,9 +107,9 @@ async def generate_ad_ideas(
         customization=payload.customization
     )
     
-    # Store ideas in session as JSON string
-    session.final_prompts = json.dumps([idea.dict() for idea in ideas])
-    db.commit()
+    # Store ideas, one row per idea
+    await session_store.save_ideas(db, session.id, [idea.dict() for idea in ideas])
+    await db.commit()
     
     return schemas.GenerateIdeasResponse(
         session_id=session.id,
@@ -177,31 +120,26 @@ async def generate_ad_ideas(
 @router.post("/generate-ads", response_model=schemas.GenerateAdsResponse)
 async def generate_ads(
     payload: schemas.GenerateAdsRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Generate actual ad images based on selected ideas"""
     # Get session
-    session = db.query(models.Session).filter(models.Session.id == payload.session_id).first()
+    session = await db.get(models.Session, payload.session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Parse final prompts from JSON string
-    final_prompts = json.loads(session.final_prompts) if session.final_prompts else []
-    
     # Get selected ideas
-    selected_ideas = [
-        idea for idea in final_prompts 
-        if idea["id"] in payload.selected_idea_ids
-    ]
+    selected_ideas = await session_store.get_ideas(db, session.id, idea_ids=payload.selected_idea_ids)
     
     if not selected_ideas:
         raise HTTPException(status_code=400, detail="No valid ideas selected")
     
     job_ids = []
+    seed_buckets = {}
     
-    # Parse product info and research data for prompt generation
-    product_info = json.loads(session.refined_prompt) if session.refined_prompt else {}
-    research_data = json.loads(session.trend_data) if session.trend_data else {}
+    # Product info and the research section prompt generation uses
+    product_info = await session_store.get_product_info(db, session.id)
+    research_data = await session_store.get_research(db, session.id, ["market_trends"])
     
     # Create generation jobs
     for idea in selected_ideas:
@@ -210,18 +148,19 @@ async def generate_ads(
             job = models.GenerationJob(
                 id=job_id,
                 session_id=session.id,
+                idea_id=idea["id"],
+                variation_index=i,
                 status=models.JobStatus.PENDING,
                 prompt_used=ad_generation_service.create_image_prompt(idea, product_info, research_data)
             )
             db.add(job)
             job_ids.append(job_id)
+            seed_buckets[job_id] = i
     
-    db.commit()
+    await db.commit()
     
-    # For now, simulate image generation without Celery
-    # TODO: Implement actual image generation
-    import asyncio
-    asyncio.create_task(simulate_image_generation(job_ids))
+    # Hand the batch to the in-process generation pool; results are committed per job
+    generation_pool.submit(job_ids, seed_buckets)
     
     return schemas.GenerateAdsResponse(
         job_ids=job_ids,
@@ -230,58 +169,112 @@ async def generate_ads(
 
 
 @router.get("/ad-status/{job_id}", response_model=schemas.AdGenerationStatus)
-async def check_ad_status(job_id: str, db: Session = Depends(database.get_db)):
+async def check_ad_status(job_id: str, db: AsyncSession = Depends(database.get_async_db)):
     """Check status of ad generation job"""
-    job = db.query(models.GenerationJob).filter(models.GenerationJob.id == job_id).first()
-    if not job:
+    statuses = await ad_status_service.get_statuses(db, job_ids=[job_id])
+    if not statuses:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    result = None
-    if job.status == models.JobStatus.COMPLETED:
-        image = db.query(models.GeneratedImage).filter(
-            models.GeneratedImage.job_id == job_id
-        ).first()
-        
-        if image:
-            # Find which idea this belongs to
-            session = db.query(models.Session).filter(models.Session.id == job.session_id).first()
-            idea_id = "unknown"
-            if session and session.final_prompts:
-                final_prompts = json.loads(session.final_prompts)
-                for idea in final_prompts:
-                    # Check if the idea's name or theme is in the prompt
-                    idea_name = idea.get("name", "")
-                    idea_theme = idea.get("theme", "")
-                    if (idea_name and idea_name in job.prompt_used) or (idea_theme and idea_theme in job.prompt_used):
-                        idea_id = idea.get("id", "unknown")
-                        break
+    return statuses[0]
+
+
+@router.post("/ad-status/batch", response_model=schemas.AdStatusBatchResponse)
+async def check_ad_status_batch(
+    payload: schemas.AdStatusBatchRequest,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Check the status of many generation jobs (by job IDs and/or session) in one round trip"""
+    if not payload.job_ids and not payload.session_id:
+        raise HTTPException(status_code=400, detail="job_ids or session_id is required")
+    
+    statuses = await ad_status_service.get_statuses(
+        db,
+        job_ids=payload.job_ids or None,
+        session_id=payload.session_id
+    )
+    
+    found = {status.job_id for status in statuses}
+    return schemas.AdStatusBatchResponse(
+        statuses=statuses,
+        missing_job_ids=[job_id for job_id in payload.job_ids or [] if job_id not in found]
+    )
+
+
+async def _load_session_statuses(session_id: str, job_ids: Optional[List[str]]) -> Optional[List[dict]]:
+    """Current status events for a session's jobs"""
+    # Short-lived session: the stream itself can stay open for minutes
+    async with database.AsyncSessionLocal() as db:
+        exists = await db.scalar(select(models.Session.id).where(models.Session.id == session_id))
+        if not exists:
+            return None
+        statuses = await ad_status_service.get_statuses(db, job_ids=job_ids, session_id=session_id)
+        return [ad_status_service.to_event(status) for status in statuses]
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json_codec.dumps(data)}\n\n"
+
+
+@router.get("/ad-status/stream/{session_id}")
+async def stream_ad_status(session_id: str, job_ids: Optional[str] = None):
+    """
+    Server-sent events for a session's generation jobs (replaces polling /ad-status).
+    Emits the current state of every job first, then each transition as it happens,
+    and a final `done` event once all tracked jobs have completed or failed.
+    `job_ids` (comma-separated) narrows the stream to one batch.
+    """
+    wanted = [job_id for job_id in job_ids.split(",") if job_id] if job_ids else None
+    broker = events.get_broker()
+    
+    # Subscribe before taking the snapshot so no transition falls in between
+    subscription = AsyncExitStack()
+    queue = await subscription.enter_async_context(broker.subscribe(events.session_channel(session_id)))
+    try:
+        snapshot = await _load_session_statuses(session_id, wanted)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+    except BaseException:
+        await subscription.aclose()
+        raise
+    
+    async def event_stream():
+        async with subscription:
+            pending = set()
+            for event in snapshot:
+                yield _sse("job_status", event)
+                if event["status"] in ad_status_service.TERMINAL_STATUSES:
+                    pending.discard(event["job_id"])
+                else:
+                    pending.add(event["job_id"])
             
-            result = schemas.GeneratedAd(
-                ad_id=image.id,
-                idea_id=idea_id,
-                image_url=image.image_url,
-                thumbnail_url=image.thumbnail_url,
-                prompt_used=image.prompt_used,
-                performance_prediction={
-                    "engagement_score": 0.75,
-                    "conversion_likelihood": 0.68,
-                    "brand_alignment": 0.82
-                },
-                created_at=image.created_at
-            )
+            while pending:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if wanted and event.get("job_id") not in wanted:
+                    continue
+                yield _sse("job_status", event)
+                if event.get("status") in ad_status_service.TERMINAL_STATUSES:
+                    pending.discard(event.get("job_id"))
+                else:
+                    pending.add(event.get("job_id"))
+            
+            yield _sse("done", {"session_id": session_id})
     
-    return schemas.AdGenerationStatus(
-        job_id=job_id,
-        status=job.status.value,
-        result=result,
-        error=job.error_message
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
 @router.post("/post-ad-to-meta")
 async def post_ad_to_meta(
     payload: dict,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Post generated ad to Facebook/Meta Marketing API"""
     try:
@@ -296,26 +289,21 @@ async def post_ad_to_meta(
             )
         
         # Get session data
-        session = db.query(models.Session).filter(models.Session.id == session_id).first()
+        session = await db.get(models.Session, session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
         # Get generated image data
-        image = db.query(models.GeneratedImage).filter(models.GeneratedImage.id == ad_id).first()
+        image = await db.get(models.GeneratedImage, ad_id)
         if not image:
             raise HTTPException(status_code=404, detail="Generated image not found")
         
-        # Parse session data for Facebook campaign
-        product_info = json.loads(session.refined_prompt) if session.refined_prompt else {}
-        research_data = json.loads(session.trend_data) if session.trend_data else {}
-        final_prompts = json.loads(session.final_prompts) if session.final_prompts else []
+        # Load session data for Facebook campaign
+        product_info = await session_store.get_product_info(db, session_id)
         
         # Find the idea associated with this image
-        idea_data = {}
-        for idea in final_prompts:
-            if idea.get("name", "") in image.prompt_used or idea.get("theme", "") in image.prompt_used:
-                idea_data = idea
-                break
+        ideas = await session_store.get_ideas(db, session_id, idea_ids=[image.idea_id]) if image.idea_id else []
+        idea_data = ideas[0] if ideas else {}
         
         # Prepare session data for Facebook API
         session_data = {
@@ -328,15 +316,19 @@ async def post_ad_to_meta(
             "daily_budget": payload.get("daily_budget", 1000)  # Default $10
         }
         
-        # Get the image file path (assuming it's stored locally)
-        # You may need to adjust this based on your actual image storage
+        # Resolve a local file for the upload, preferring the Meta-ready 1080x1080 JPEG rendition
         import os
         from urllib.parse import urlparse
         
-        # Extract filename from URL and construct local path
-        url_path = urlparse(image.image_url).path
-        filename = os.path.basename(url_path)
-        image_path = os.path.join("static", "generated", filename)
+        metadata = image.image_metadata_json
+        storage_key = metadata.get("rendition_keys", {}).get("meta_feed") or metadata.get("storage_key")
+        if storage_key:
+            image_path = await asyncio.to_thread(storage_service.get_storage().local_path, storage_key)
+        else:
+            # Images generated before content-addressed storage live directly in static/generated
+            url_path = urlparse(image.image_url).path
+            filename = os.path.basename(url_path)
+            image_path = os.path.join("static", "generated", filename)
         
         # Check if image file exists
         if not os.path.exists(image_path):
@@ -1,26 +1,70 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import chat_schema as chat_schemas
+from app.services import session_store
 from app.services.conversational_agent import ConversationalAgent
 from app.core import database
+from app.models import models
 
 router = APIRouter()
 
+
+def _to_schema(message: models.ChatMessage) -> chat_schemas.ChatMessage:
+    return chat_schemas.ChatMessage(role=message.role, content=message.content, sequence=message.sequence)
+
+
 @router.post("/chat", response_model=chat_schemas.ChatResponse)
 async def chat_with_bot(
     payload: chat_schemas.ChatRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """
     Endpoint for conversational chat with the Gemini model.
+    Returns only the new messages and a cursor; use /chat/{session_id}/history for older ones.
     """
-    agent = ConversationalAgent(session_id=payload.session_id, db=db)
-    response_data = agent.process_message(payload.message)
+    agent = await ConversationalAgent.load(session_id=payload.session_id, db=db)
+    response_data = await agent.process_message(payload.message, cursor=payload.cursor)
 
     return chat_schemas.ChatResponse(
         session_id=payload.session_id,
         response=response_data["response"],
         stage=response_data["stage"],
-        conversation_history=response_data["conversation_history"],
+        messages=[_to_schema(message) for message in response_data["messages"]],
+        cursor=response_data["cursor"],
+        has_more=response_data["has_more"],
         ideas=response_data.get("ideas")
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/chat/{session_id}/history", response_model=chat_schemas.ChatHistoryResponse)
+async def get_chat_history(
+    session_id: str,
+    before: Optional[int] = Query(default=None, description="Return messages older than this sequence"),
+    after: Optional[int] = Query(default=None, description="Return messages newer than this sequence"),
+    limit: int = Query(default=50, ge=1, le=200),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Page through a chat session's messages. Without a cursor, returns the newest
+    `limit` messages; pass `before` (the first sequence you have) to scroll back.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Pass either before or after, not both")
+    
+    # One extra row tells us whether another page exists
+    messages = await session_store.get_messages(db, session_id, after=after, before=before, limit=limit + 1)
+    if not messages and not await db.get(models.Session, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    has_more = len(messages) > limit
+    if has_more:
+        # Backward pages drop the oldest extra row, forward pages the newest
+        messages = messages[:limit] if after is not None else messages[1:]
+    
+    return chat_schemas.ChatHistoryResponse(
+        session_id=session_id,
+        messages=[_to_schema(message) for message in messages],
+        has_more=has_more
+    )
@@ -1,18 +1,22 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer_group
 from app.schemas import schemas
 from app.core import config, database
 from app.models import models
 from app.services import trend_service, keyword_extraction_service
+import asyncio
 import uuid
 
 router = APIRouter()
 
 
 @router.post("/prompt/start", response_model=schemas.PromptStartResponse)
-async def start_prompt(payload: schemas.PromptStartRequest, db: Session = Depends(database.get_db)):
-    # Extract Keywords
-    keywords = keyword_extraction_service.extract_keywords(payload.text)
+async def start_prompt(payload: schemas.PromptStartRequest, db: AsyncSession = Depends(database.get_async_db)):
+    # Extract Keywords (micro-batched with concurrent requests, off the event loop)
+    scored_keywords, keyword_source = await keyword_extraction_service.extract_scored_keywords_async(payload.text)
+    keywords = [keyword for keyword, _ in scored_keywords]
     if not keywords:
         raise HTTPException(status_code=422, detail="Could not extract keywords from the input.")
 
@@ -21,18 +25,17 @@ async def start_prompt(payload: schemas.PromptStartRequest, db: Session = Depend
     session = models.Session(
         id=session_id,
         initial_prompt=payload.text,
-        extracted_keywords=keywords
+        extracted_keywords_json=keywords
     )
     db.add(session)
-    db.commit()
+    await db.commit()
 
     # Fetch Trend Data
-    trend_data = trend_service.fetch_trend_data(keywords)
+    trend_data = await trend_service.fetch_trend_data(keywords)
 
     # Store Trend Data
-    session.trend_data = trend_data
-    db.add(session)
-    db.commit()
+    session.trend_data_json = trend_data
+    await db.commit()
 
     # Generate Clarifying Questions
     questions = trend_service.generate_clarifying_questions(trend_data)
@@ -40,25 +43,57 @@ async def start_prompt(payload: schemas.PromptStartRequest, db: Session = Depend
     return schemas.PromptStartResponse(
         session_id=session_id,
         extracted_keywords=keywords,
+        keyword_scores=dict(scored_keywords),
+        keyword_source=keyword_source,
         questions=questions
     )
 
 
+@router.post("/prompt/keywords/batch", response_model=schemas.KeywordBatchResponse)
+async def extract_keywords_batch(payload: schemas.KeywordBatchRequest, db: AsyncSession = Depends(database.get_async_db)):
+    """Extract keywords for many texts, and/or re-key stored sessions from their initial prompts"""
+    texts = payload.texts or []
+    session_ids = payload.session_ids or []
+    if not texts and not session_ids:
+        raise HTTPException(status_code=400, detail="texts or session_ids is required")
+    if len(texts) + len(session_ids) > config.settings.KEYWORD_BATCH_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {config.settings.KEYWORD_BATCH_MAX_TEXTS} texts per request")
+
+    sessions = []
+    if session_ids:
+        sessions = (await db.scalars(select(models.Session).where(models.Session.id.in_(session_ids)))).all()
+
+    results = await asyncio.to_thread(
+        keyword_extraction_service.extract_keywords_batch,
+        texts + [session.initial_prompt for session in sessions]
+    )
+
+    rekeyed = {}
+    for session, keywords in zip(sessions, results[len(texts):]):
+        session.extracted_keywords_json = keywords
+        rekeyed[session.id] = keywords
+    if sessions:
+        await db.commit()
+
+    return schemas.KeywordBatchResponse(
+        keywords=results[:len(texts)],
+        sessions=rekeyed,
+        missing_session_ids=[session_id for session_id in session_ids if session_id not in rekeyed]
+    )
+
+
 @router.post("/prompt/refine", response_model=schemas.PromptRefineResponse)
-async def refine_prompt(payload: schemas.PromptRefineRequest, db: Session = Depends(database.get_db)):
+async def refine_prompt(payload: schemas.PromptRefineRequest, db: AsyncSession = Depends(database.get_async_db)):
     # Get session
-    session = db.query(models.Session).filter(models.Session.id == payload.session_id).first()
+    session = await db.get(models.Session, payload.session_id, options=[undefer_group("legacy_blobs")])
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Store user answers in session (you might want to create a separate table for this)
-    if not session.refined_prompt:
-        session.refined_prompt = {}
-    
     # Merge answers
-    refined_data = session.refined_prompt or {}
+    refined_data = session.refined_prompt_json
     refined_data.update(payload.answers)
-    session.refined_prompt = refined_data
+    session.refined_prompt_json = refined_data
     
     # Check if we have all required answers
     # In a real implementation, you'd check against the questions generated in phase 1
@@ -69,12 +104,12 @@ async def refine_prompt(payload: schemas.PromptRefineRequest, db: Session = Depe
         # Generate final prompts based on all collected data
         final_prompts = trend_service.generate_final_prompts(
             session.initial_prompt,
-            session.extracted_keywords,
+            session.extracted_keywords_json,
             refined_data,
-            session.trend_data
+            session.trend_data_json
         )
-        session.final_prompts = final_prompts
-        db.commit()
+        session.final_prompts_json = final_prompts
+        await db.commit()
         
         return schemas.PromptRefineResponse(
             session_id=session.id,
@@ -84,7 +119,7 @@ async def refine_prompt(payload: schemas.PromptRefineRequest, db: Session = Depe
     else:
         # Generate additional questions if needed
         # This is simplified - in production you'd have more sophisticated logic
-        db.commit()
+        await db.commit()
         return schemas.PromptRefineResponse(
             session_id=session.id,
             needs_more_info=True,
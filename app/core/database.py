@@ -1,18 +1,180 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from app.core import json_codec
 from app.core.config import settings
-import os
 
-# Force SQLite for development to avoid PostgreSQL issues
-DATABASE_URL = "sqlite:///./app_data.db"
+DATABASE_URL = settings.DATABASE_URL
+
+# Async drivers used by the FastAPI endpoints (aiosqlite for dev, asyncpg for Postgres)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+class PoolMetrics:
+    """Checkout counters and wait/hold timings for one connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_hold = 0.0
+        self.max_hold = 0.0
+        self.checkins = 0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def record_hold(self, seconds: float) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.total_hold += seconds
+            self.max_hold = max(self.max_hold, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_hold_ms": round(self.total_hold / self.checkins * 1000, 3) if self.checkins else 0.0,
+                "max_hold_ms": round(self.max_hold * 1000, 3),
+            }
+
+
+class _MeteredPoolMixin:
+    """Records how long callers wait to check out a connection"""
+    metrics: PoolMetrics
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    metrics = PoolMetrics()
+
+
+class MeteredAsyncQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    metrics = PoolMetrics()
+
+
+def _is_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+
+def engine_options(url, poolclass=MeteredQueuePool) -> Dict[str, Any]:
+    """create_engine() keyword arguments for `url`, driven by settings"""
+    options: Dict[str, Any] = {
+        "echo": settings.DB_ECHO,
+        # JSON columns go through the shared (orjson) codec
+        "json_serializer": json_codec.dumps,
+        "json_deserializer": json_codec.loads,
+    }
+    if _is_sqlite(url):
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+        if url.database in (None, "", ":memory:"):
+            # An in-memory database only exists on its one connection
+            options["poolclass"] = StaticPool
+            return options
+    else:
+        options["pool_pre_ping"] = settings.DB_POOL_PRE_PING
+        options["pool_recycle"] = settings.DB_POOL_RECYCLE
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False  # Set to True for SQL debugging
-)
+    options.update(
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL lets pollers read while a job writer holds the write lock
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
+def instrument_engine(engine: Engine, metrics: PoolMetrics) -> None:
+    """Attach SQLite pragmas and pool hold-time metrics to `engine`"""
+    if _is_sqlite(engine.url):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            metrics.record_hold(time.perf_counter() - started)
+
+
+def to_async_url(url):
+    """Swap the sync DBAPI driver in `url` for its asyncio counterpart"""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+_url = make_url(DATABASE_URL)
+
+# Sync engine: Celery tasks, scripts and migrations
+engine = create_engine(_url, **engine_options(_url))
+instrument_engine(engine, MeteredQueuePool.metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: FastAPI endpoints and in-process background work
+_async_url = to_async_url(_url)
+async_engine = create_async_engine(_async_url, **engine_options(_async_url, poolclass=MeteredAsyncQueuePool))
+instrument_engine(async_engine.sync_engine, MeteredAsyncQueuePool.metrics)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 class Base(DeclarativeBase):
     pass
 
@@ -23,3 +185,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _stats_for(engine: Engine, metrics: PoolMetrics) -> Dict[str, Any]:
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool": pool.__class__.__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+    stats.update(metrics.snapshot())
+    return stats
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Current pool occupancy plus checkout metrics, for sizing workers"""
+    return {
+        "backend": _url.get_backend_name(),
+        "sync": _stats_for(engine, MeteredQueuePool.metrics),
+        "async": _stats_for(async_engine.sync_engine, MeteredAsyncQueuePool.metrics),
+    }
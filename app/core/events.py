@@ -0,0 +1,91 @@
+"""
+Publish/subscribe for server-pushed events (job status transitions, ...).
+
+The in-process broker is enough for a single API worker. With several workers,
+set EVENT_BROKER=redis so events published by one worker's generation pool reach
+stream subscribers connected to another.
+"""
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from app.core import json_codec
+from app.core.config import settings
+
+
+class InProcessBroker:
+    """Fan-out to asyncio queues within this process"""
+
+    def __init__(self, max_queue_size: int = 256):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        for queue in list(self._subscribers.get(channel, ())):
+            if queue.full():
+                # Slow consumer: drop the oldest event rather than block publishers
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers[channel].add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+class RedisBroker:
+    """Same interface as InProcessBroker, backed by Redis pub/sub channels"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(url, decode_responses=True)
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> None:
+        await self._redis.publish(channel, json_codec.dumps(event))
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue()
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(channel)
+
+        async def reader():
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    await queue.put(json_codec.loads(message["data"]))
+
+        reader_task = asyncio.create_task(reader())
+        try:
+            yield queue
+        finally:
+            reader_task.cancel()
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+
+
+_broker: Optional[Any] = None
+
+
+def get_broker():
+    """Return the configured broker (EVENT_BROKER: "memory" or "redis")"""
+    global _broker
+    if _broker is None:
+        if settings.EVENT_BROKER == "redis":
+            _broker = RedisBroker(settings.REDIS_URL)
+        else:
+            _broker = InProcessBroker()
+    return _broker
+
+
+def session_channel(session_id: str) -> str:
+    return f"session:{session_id}"
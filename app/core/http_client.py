@@ -0,0 +1,95 @@
+"""
+Long-lived HTTP clients shared by the image provider layer.
+
+httpx connections are bound to the event loop that opened them, so one pooled
+client is kept per running loop. The API worker has a single loop and therefore
+a single connection pool. Sync callers (Celery tasks, the chat agent) go through
+run_sync(), which drives one background loop per process so they reuse a pool
+as well instead of paying a TLS handshake per request.
+"""
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Awaitable, Optional, TypeVar
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# HTTP/2 needs the optional `h2` package (installed via httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=10.0),
+        follow_redirects=True,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the pooled AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_http_client()
+        _http_clients[loop] = client
+    return client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Return an AsyncOpenAI client that shares the loop's connection pool"""
+    loop = asyncio.get_running_loop()
+    client = _openai_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=get_http_client(),
+        )
+        _openai_clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close the clients owned by the running loop (call on shutdown)"""
+    loop = asyncio.get_running_loop()
+    _openai_clients.pop(loop, None)
+    client = _http_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None or _sync_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="http-client-loop", daemon=True)
+            thread.start()
+            _sync_loop = loop
+    return _sync_loop
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine from synchronous code on the per-process background loop.
+    Must not be called from that loop itself.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_sync_loop())
+    return future.result(timeout)
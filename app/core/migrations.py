@@ -0,0 +1,190 @@
+"""
+Idempotent schema upgrades for existing databases.
+
+Base.metadata.create_all() only creates missing tables; it never alters ones
+that already exist (e.g. an old app_data.db). upgrade() adds missing columns and
+indexes, then backfills data for them (including the normalized session tables
+from the legacy JSON blobs on sessions). It is safe to run repeatedly:
+
+    python -m app.core.migrations
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as OrmSession
+
+from app.core import json_codec
+from app.core.database import Base, engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+# table -> [(column, DDL type)]
+ADDED_COLUMNS = {
+    "generation_jobs": [("idea_id", "VARCHAR"), ("variation_index", "INTEGER")],
+    "generated_images": [("idea_id", "VARCHAR"), ("variation_index", "INTEGER")],
+}
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if table not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl_type in columns:
+                if name not in present:
+                    logger.info(f"Adding column {table}.{name}")
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+
+
+def _create_missing_indexes(engine: Engine) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _match_idea(final_prompts: List[Dict], prompt_used: str):
+    # Legacy rows only have the prompt text; recover the idea the old way, once
+    for idea in final_prompts:
+        idea_name = idea.get("name", "")
+        idea_theme = idea.get("theme", "")
+        if (idea_name and idea_name in prompt_used) or (idea_theme and idea_theme in prompt_used):
+            return idea.get("id")
+    return None
+
+
+def _backfill_idea_ids(engine: Engine) -> None:
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT j.id, j.session_id, j.prompt_used, s.final_prompts "
+            "FROM generation_jobs j LEFT JOIN sessions s ON s.id = j.session_id "
+            "WHERE j.idea_id IS NULL ORDER BY j.session_id, j.created_at"
+        )).fetchall()
+        if not rows:
+            return
+
+        ideas_by_session: Dict[str, List[Dict]] = {}
+        counters: Dict[tuple, int] = defaultdict(int)
+        updated = 0
+        for job_id, session_id, prompt_used, final_prompts in rows:
+            if session_id not in ideas_by_session:
+                try:
+                    ideas_by_session[session_id] = json_codec.loads(final_prompts) if final_prompts else []
+                except ValueError:
+                    ideas_by_session[session_id] = []
+            idea_id = _match_idea(ideas_by_session[session_id], prompt_used or "")
+            if idea_id is None:
+                continue
+            variation_index = counters[(session_id, idea_id)]
+            counters[(session_id, idea_id)] += 1
+            conn.execute(
+                text("UPDATE generation_jobs SET idea_id = :idea_id, variation_index = :variation_index WHERE id = :id"),
+                {"idea_id": idea_id, "variation_index": variation_index, "id": job_id}
+            )
+            updated += 1
+
+        conn.execute(text(
+            "UPDATE generated_images SET "
+            "idea_id = (SELECT j.idea_id FROM generation_jobs j WHERE j.id = generated_images.job_id), "
+            "variation_index = (SELECT j.variation_index FROM generation_jobs j WHERE j.id = generated_images.job_id) "
+            "WHERE idea_id IS NULL AND job_id IS NOT NULL"
+        ))
+        logger.info(f"Backfilled idea_id for {updated} generation jobs")
+
+
+def _loads(blob):
+    try:
+        return json_codec.loads(blob) if blob else None
+    except ValueError:
+        return None
+
+
+def _backfill_session_tables(engine: Engine) -> None:
+    """Copy legacy sessions.* JSON blobs into product_info, research_results, ad_ideas and chat tables"""
+    from app.models import models
+
+    with OrmSession(engine) as db:
+        rows = db.execute(
+            select(models.Session.id, models.Session.refined_prompt, models.Session.trend_data, models.Session.final_prompts)
+            .where(
+                models.Session.refined_prompt.isnot(None)
+                | models.Session.trend_data.isnot(None)
+                | models.Session.final_prompts.isnot(None)
+            )
+        ).all()
+        if not rows:
+            return
+
+        has_product_info = set(db.scalars(select(models.ProductInfo.session_id)))
+        has_research = set(db.scalars(select(models.ResearchResult.session_id).distinct()))
+        has_ideas = set(db.scalars(select(models.AdIdea.session_id).distinct()))
+        has_chat = set(db.scalars(select(models.ChatState.session_id)))
+
+        migrated = 0
+        for session_id, refined_prompt, trend_data, final_prompts in rows:
+            pending = len(db.new)
+            refined = _loads(refined_prompt)
+            trends = _loads(trend_data)
+            ideas = _loads(final_prompts)
+
+            if isinstance(refined, dict) and "stage" in refined:
+                # Chat sessions kept their whole conversation state in refined_prompt
+                # and the collected answers in trend_data
+                if session_id in has_chat:
+                    continue
+                db.add(models.ChatState(
+                    session_id=session_id,
+                    stage=(refined.get("stage") or "gathering_info").lower(),  # early rows used enum names
+                    current_question_index=refined.get("current_question_index", 0),
+                    collected_data=refined.get("collected_data") or {},
+                    generated_images=refined.get("generated_images")
+                ))
+                db.add_all(
+                    models.ChatMessage(session_id=session_id, sequence=sequence, role=message.get("role"), content=message.get("content"))
+                    for sequence, message in enumerate(refined.get("conversation_history") or [], start=1)
+                )
+                if refined.get("ideas") and session_id not in has_ideas:
+                    db.add_all(models.AdIdea.from_dict(session_id, position, idea) for position, idea in enumerate(refined["ideas"]))
+                if isinstance(trends, dict) and session_id not in has_product_info:
+                    db.add(models.ProductInfo.from_dict(session_id, trends))
+            else:
+                # Ad wizard sessions: product info, research and ideas
+                if isinstance(refined, dict) and "company_name" in refined and session_id not in has_product_info:
+                    db.add(models.ProductInfo.from_dict(session_id, refined))
+                if isinstance(trends, dict) and "market_trends" in trends and session_id not in has_research:
+                    db.add_all(
+                        models.ResearchResult(session_id=session_id, section=section, data=data)
+                        for section, data in trends.items()
+                    )
+                if isinstance(ideas, list) and session_id not in has_ideas:
+                    db.add_all(
+                        models.AdIdea.from_dict(session_id, position, idea)
+                        for position, idea in enumerate(ideas)
+                        if isinstance(idea, dict) and "id" in idea
+                    )
+            if len(db.new) > pending:
+                migrated += 1
+
+        db.commit()
+        logger.info(f"Backfilled normalized session data for {migrated} sessions")
+
+
+def upgrade(engine: Engine = default_engine) -> None:
+    """Bring an existing database up to the current models"""
+    from app.models import models  # noqa: F401  (register all tables)
+
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+    _create_missing_indexes(engine)
+    _backfill_idea_ids(engine)
+    _backfill_session_tables(engine)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade()
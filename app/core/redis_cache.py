@@ -0,0 +1,208 @@
+"""
+Fault-tolerant Redis key/value cache.
+
+The pooled client is created lazily (per event loop) on first use rather than
+at import time. A circuit breaker stops sending commands to a Redis that keeps
+failing, and every value is also kept in a bounded in-process TTLCache, so
+lookups degrade to local caching while Redis is unreachable instead of
+raising or waiting on timeouts.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. After `failure_threshold` consecutive failures it opens
+    and rejects calls for `reset_timeout` seconds, then lets one trial call
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def release_trial(self) -> None:
+        """Give up a half-open trial that ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_progress:
+                    self.trips += 1
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+
+class FallbackRedisCache:
+    """String values in Redis with a TTL, mirrored in a local TTLCache for outages"""
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        local_maxsize: int = 1024,
+        local_ttl: float = 3600,
+        max_connections: int = 50,
+        socket_timeout: float = 0.5,
+        health_check_interval: int = 30,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.name = name
+        self.url = url
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.health_check_interval = health_check_interval
+        self.breaker = breaker or CircuitBreaker()
+        # Values mirrored from Redis expire locally too, so an outage never serves them indefinitely
+        self.local = TTLCache(maxsize=local_maxsize, ttl=local_ttl)
+        # redis.asyncio connections belong to the loop that opened them
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self.redis_errors = 0
+        self.fallbacks = 0
+
+    def _redis(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import redis.asyncio as aioredis
+
+            client = aioredis.Redis(
+                connection_pool=aioredis.ConnectionPool.from_url(
+                    self.url,
+                    max_connections=self.max_connections,
+                    socket_timeout=self.socket_timeout,
+                    socket_connect_timeout=self.socket_timeout,
+                    health_check_interval=self.health_check_interval,
+                    decode_responses=True
+                )
+            )
+            self._clients[loop] = client
+        return client
+
+    async def _call(self, command: str, *args, **kwargs):
+        """Run a Redis command through the breaker; raises ConnectionError when skipped or failed"""
+        return await self._guarded(command, lambda redis: getattr(redis, command)(*args, **kwargs))
+
+    async def _guarded(self, command: str, operation: Callable[[Any], Awaitable[Any]]):
+        if not self.breaker.allow():
+            raise ConnectionError(f"{self.name}: Redis circuit open")
+        try:
+            result = await operation(self._redis())
+        except asyncio.CancelledError:
+            # Says nothing about Redis, but a claimed half-open trial must be freed
+            # or allow() would refuse every call from now on
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            self.redis_errors += 1
+            self.breaker.record_failure()
+            logger.warning(f"{self.name} cache: Redis {command} failed ({str(e)}); using local cache")
+            raise ConnectionError(str(e)) from e
+        self.breaker.record_success()
+        return result
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self._call("get", key)
+        except ConnectionError:
+            self.fallbacks += 1
+            return self.local.get(key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self.local.set(key, value, ttl=ttl)
+        try:
+            await self._call("set", key, value, ex=max(1, int(ttl)))
+        except ConnectionError:
+            self.fallbacks += 1
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Values for `keys` in one MGET round trip (None where missing)"""
+        if not keys:
+            return []
+        try:
+            values = await self._call("mget", keys)
+        except ConnectionError:
+            self.fallbacks += 1
+            return [self.local.get(key) for key in keys]
+        for key, value in zip(keys, values):
+            if value is not None:
+                self.local.set(key, value)
+        return values
+
+    async def mset(self, values: Dict[str, str], ttl: float) -> None:
+        """Write many keys with a TTL in one pipelined round trip"""
+        if not values:
+            return
+        for key, value in values.items():
+            self.local.set(key, value, ttl=ttl)
+
+        async def pipelined(redis):
+            # MSET cannot set expiries, so pipeline SET ... EX instead
+            pipe = redis.pipeline(transaction=False)
+            for key, value in values.items():
+                pipe.set(key, value, ex=max(1, int(ttl)))
+            return await pipe.execute()
+
+        try:
+            await self._guarded("mset", pipelined)
+        except ConnectionError:
+            self.fallbacks += 1
+
+    async def ping(self) -> bool:
+        try:
+            return bool(await self._call("ping"))
+        except ConnectionError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "trips": self.breaker.trips,
+            "redis_errors": self.redis_errors,
+            "fallbacks": self.fallbacks,
+            "local": self.local.stats(),
+        }
@@ -0,0 +1,223 @@
+"""
+Request coalescing ("single-flight").
+
+Concurrent callers asking for the same key share one execution instead of each
+doing the work: within a process they await the same in-flight future, and
+with SINGLEFLIGHT_BACKEND=redis a Redis lock elects one leader across API
+workers while the others wait for the result it publishes. While Redis's
+circuit breaker is open, calls skip the lock and coalesce in-process only.
+
+Results are shared between callers as-is; callers must not mutate them.
+"""
+import asyncio
+import logging
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core import json_codec
+from app.core.config import settings
+from app.core.redis_cache import CircuitBreaker, FallbackRedisCache
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisFlightLock:
+    """
+    Cross-process leader election: the caller that wins SET NX runs the work and
+    publishes its result under a short-lived key; the rest poll for that result
+    (or for the lock to expire if the leader died). Commands go through `redis`,
+    whose per-loop client and circuit breaker are shared by every group.
+    """
+
+    def __init__(
+        self,
+        redis: FallbackRedisCache,
+        lock_ttl: float = 60.0,
+        result_ttl: float = 30.0,
+        poll_interval: float = 0.05
+    ):
+        self.redis = redis
+        self.lock_ttl_ms = int(lock_ttl * 1000)
+        self.result_ttl_ms = int(result_ttl * 1000)
+        self.poll_interval = poll_interval
+
+    def available(self) -> bool:
+        """False while the breaker is open, so callers skip Redis instead of timing out"""
+        return self.redis.breaker.state != "open"
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"singleflight:lock:{key}"
+        result_key = f"singleflight:result:{key}"
+        token = uuid.uuid4().hex
+        waited = False
+
+        while True:
+            if waited:
+                raw = await self.redis._call("get", result_key)
+                if raw is not None:
+                    return json_codec.loads(raw)
+
+            if await self.redis._call("set", lock_key, token, nx=True, px=self.lock_ttl_ms):
+                try:
+                    result = await fn()
+                    await self._publish(result_key, result)
+                    return result
+                finally:
+                    await self._release(lock_key, token)
+
+            waited = True
+            await asyncio.sleep(self.poll_interval)
+
+    async def _publish(self, result_key: str, result: Any) -> None:
+        try:
+            await self.redis._call("set", result_key, json_codec.dumps(result), px=self.result_ttl_ms)
+        except Exception as e:
+            # Waiters fall back to taking the lock themselves once it is released
+            logger.warning(f"Could not publish single-flight result {result_key}: {str(e)}")
+
+    async def _release(self, lock_key: str, token: str) -> None:
+        try:
+            await self.redis._call("eval", _RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            # The lock expires on its own after lock_ttl
+            logger.warning(f"Could not release single-flight lock {lock_key}: {str(e)}")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution"""
+
+    def __init__(self, name: str, distributed: Optional[RedisFlightLock] = None):
+        self.name = name
+        self.distributed = distributed
+        # Futures are bound to their event loop, so in-flight calls are tracked per loop
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = weakref.WeakKeyDictionary()
+        self.executions = 0
+        self.coalesced = 0
+        self.distributed_errors = 0
+        self.distributed_skipped = 0
+
+    def _calls(self) -> Dict[str, asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        calls = self._inflight.get(loop)
+        if calls is None:
+            calls = self._inflight[loop] = {}
+        return calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn` for `key`, or wait for the identical call already in flight"""
+        calls = self._calls()
+        inflight = calls.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The leader was cancelled (e.g. its client went away), not this
+                # caller: run the call again, leading it or joining a new leader
+                return await self.do(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        # Retrieve the exception even when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        calls[key] = future
+        try:
+            self.executions += 1
+            result = await self._execute(key, fn)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+            raise
+        finally:
+            calls.pop(key, None)
+
+    async def _execute(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.distributed is None:
+            return await fn()
+        if not self.distributed.available():
+            # Redis is known to be down: coalesce in-process only
+            self.distributed_skipped += 1
+            return await fn()
+
+        # Track whether fn ran here, so a Redis failure afterwards never runs it twice
+        ran = False
+
+        async def tracked():
+            nonlocal ran
+            ran = True
+            return await fn()
+
+        try:
+            return await self.distributed.run(f"{self.name}:{key}", tracked)
+        except Exception as e:
+            if ran:
+                raise
+            # Coordination is an optimisation; fall back to doing the work locally
+            self.distributed_errors += 1
+            logger.warning(f"{self.name} single-flight: Redis unavailable, running locally: {str(e)}")
+            return await fn()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "distributed": self.distributed is not None,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "distributed_errors": self.distributed_errors,
+            "distributed_skipped": self.distributed_skipped,
+            "in_flight": sum(len(calls) for calls in list(self._inflight.values())),
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_redis: Optional[FallbackRedisCache] = None
+
+
+def _shared_redis() -> FallbackRedisCache:
+    """One client pool and circuit breaker for every distributed group"""
+    global _redis
+    if _redis is None:
+        _redis = FallbackRedisCache(
+            "singleflight",
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.REDIS_BREAKER_FAILURES,
+                reset_timeout=settings.REDIS_BREAKER_RESET_TIMEOUT
+            )
+        )
+    return _redis
+
+
+def group(name: str) -> SingleFlight:
+    """Shared SingleFlight for `name`, distributed when SINGLEFLIGHT_BACKEND=redis"""
+    flight = _groups.get(name)
+    if flight is None:
+        distributed = None
+        if settings.SINGLEFLIGHT_BACKEND == "redis":
+            distributed = RedisFlightLock(
+                _shared_redis(),
+                lock_ttl=settings.SINGLEFLIGHT_LOCK_TTL,
+                result_ttl=settings.SINGLEFLIGHT_RESULT_TTL,
+            )
+        flight = _groups[name] = SingleFlight(name, distributed)
+    return flight
+
+
+def stats() -> Dict[str, Any]:
+    return {name: flight.stats() for name, flight in _groups.items()}
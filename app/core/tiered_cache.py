@@ -0,0 +1,192 @@
+"""
+Two-tier cache: a bounded in-process LRU (L1) in front of a shared backend (L2)
+that all API workers see - Redis, or the trend_cache table with expires_at
+honoured.
+
+get_or_compute() also protects against stampedes: concurrent misses for the
+same key are coalesced through a SingleFlight group (per process, or across
+workers with SINGLEFLIGHT_BACKEND=redis) so the work is done once.
+"""
+import copy
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core import json_codec
+from app.core import singleflight
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis_cache import CircuitBreaker, FallbackRedisCache
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCacheBackend(FallbackRedisCache):
+    """
+    Shared tier stored as JSON strings with a Redis TTL. Uses FallbackRedisCache's
+    per-loop pooled client, socket timeouts and circuit breaker, but lets failures
+    raise: TieredCache's own L1 is the fallback, and it counts backend errors.
+    """
+
+    def __init__(self, url: str, name: str = "tiered_cache"):
+        super().__init__(
+            name,
+            url,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.REDIS_BREAKER_FAILURES,
+                reset_timeout=settings.REDIS_BREAKER_RESET_TIMEOUT
+            )
+        )
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._call("get", key)
+        return json_codec.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._call("set", key, json_codec.dumps(value), ex=max(1, int(ttl)))
+
+
+class DatabaseCacheBackend:
+    """
+    Shared tier in the trend_cache table; rows past expires_at are ignored, and
+    deleted by a write at most every `purge_interval` seconds so the table stays bounded.
+    """
+
+    def __init__(self, purge_interval: float = 600):
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+        self.purged = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        from sqlalchemy import or_, select
+
+        from app.core.database import AsyncSessionLocal
+        from app.models.models import TrendCache
+
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(
+                select(TrendCache.data).where(
+                    TrendCache.cache_key == key,
+                    or_(TrendCache.expires_at.is_(None), TrendCache.expires_at > datetime.now(timezone.utc))
+                )
+            )
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        from sqlalchemy import delete, select
+        from sqlalchemy.exc import IntegrityError
+
+        from app.core.database import AsyncSessionLocal
+        from app.models.models import TrendCache
+
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=ttl)
+        async with AsyncSessionLocal() as db:
+            if time.monotonic() - self._last_purge >= self.purge_interval:
+                self._last_purge = time.monotonic()
+                result = await db.execute(delete(TrendCache).where(TrendCache.expires_at < now))
+                self.purged += result.rowcount or 0
+            row = await db.scalar(select(TrendCache).where(TrendCache.cache_key == key))
+            if row is None:
+                db.add(TrendCache(cache_key=key, data=value, expires_at=expires_at))
+            else:
+                row.data = value
+                row.expires_at = expires_at
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker stored the same key first; its value is as good as ours
+                await db.rollback()
+
+
+def build_backend(kind: str, redis_url: Optional[str] = None, name: str = "tiered_cache"):
+    """Shared tier for a *_CACHE_BACKEND setting: "redis", "database" or "none" """
+    if kind == "redis":
+        return RedisCacheBackend(redis_url, name)
+    if kind == "database":
+        return DatabaseCacheBackend(settings.CACHE_PURGE_INTERVAL)
+    return None
+
+
+class TieredCache:
+    """In-process TTLCache in front of an optional shared backend"""
+
+    def __init__(
+        self,
+        name: str,
+        backend=None,
+        maxsize: int = 256,
+        ttl: float = 3600,
+        local_ttl: Optional[float] = None
+    ):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        # A shorter L1 TTL bounds how long one worker serves a value another worker replaced
+        self.local = TTLCache(maxsize=maxsize, ttl=local_ttl or ttl)
+        self.flight = singleflight.group(name)
+        self.backend_hits = 0
+        self.backend_errors = 0
+        self.computes = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+        return await self.get_shared(key)
+
+    async def set(self, key: str, value: Any) -> None:
+        self.local.set(key, copy.deepcopy(value))
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            # The shared tier is an optimisation; never fail the request over it
+            self.backend_errors += 1
+            logger.warning(f"{self.name} cache: could not write {key}: {str(e)}")
+
+    async def get_shared(self, key: str) -> Optional[Any]:
+        """The shared tier only, for callers that already missed in `local`; hits fill L1"""
+        if self.backend is None:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"{self.name} cache: could not read {key}: {str(e)}")
+            return None
+        if value is not None:
+            self.backend_hits += 1
+            self.local.set(key, copy.deepcopy(value))
+        return value
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for `key`, computing and storing it once on a miss"""
+        value = self.local.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+
+        async def load():
+            value = await self.get_shared(key)
+            if value is None:
+                self.computes += 1
+                value = await compute()
+                await self.set(key, value)
+            return value
+
+        return copy.deepcopy(await self.flight.do(key, load))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "circuit": self.backend.breaker.state if isinstance(self.backend, FallbackRedisCache) else None,
+            "local": self.local.stats(),
+            "backend_hits": self.backend_hits,
+            "backend_errors": self.backend_errors,
+            "computes": self.computes,
+            "flight": self.flight.stats(),
+        }
@@ -1,14 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
+from app.core import database, http_client, singleflight
+from app.services import generation_cache, keyword_extraction_service, rendition_service, research_service, storage_service, trend_service, web_scraper
 from app.api.v1.endpoints import prompt, advertising, chat
 import os
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -20,6 +24,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Serve locally stored images wherever STORAGE_LOCAL_ROOT points; mounted before
+# /static, which would otherwise shadow the default /static/generated prefix
+if settings.STORAGE_BACKEND == "local":
+    os.makedirs(storage_service.local_root(), exist_ok=True)
+    app.mount(
+        settings.STORAGE_LOCAL_URL_PREFIX.rstrip("/"),
+        StaticFiles(directory=storage_service.local_root()),
+        name="generated"
+    )
+
 # Mount static files
 static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
 os.makedirs(static_dir, exist_ok=True)
@@ -31,6 +45,19 @@ app.include_router(advertising.router, prefix=f"{settings.API_V1_STR}", tags=["a
 app.include_router(chat.router, prefix=f"{settings.API_V1_STR}", tags=["chat"])
 
 
+@app.on_event("startup")
+async def preload_models():
+    if settings.KEYWORD_NLP_PRELOAD:
+        keyword_extraction_service.warm_up()
+
+
+@app.on_event("shutdown")
+async def release_shared_resources():
+    await http_client.aclose()
+    rendition_service.shutdown()
+    web_scraper.shutdown()
+
+
 @app.get("/")
 async def root():
     return {
@@ -43,3 +70,16 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "generation_cache": generation_cache.stats(),
+        "research_cache": research_service.research_cache.stats(),
+        "keywords": keyword_extraction_service.stats(),
+        "singleflight": singleflight.stats(),
+        "trend_cache": trend_service.stats(),
+        "scraper": web_scraper.stats(),
+        "database": database.pool_stats()
+    }
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, String, Text, DateTime, JSON, ForeignKey, Enum, Integer
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Enum, Integer, Float, Index
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
+from app.core import json_codec
 from app.core.database import Base
+from app.models.types import JSONType
 import enum
 import uuid
-import json
 
 
 class JobStatus(str, enum.Enum):
@@ -20,55 +21,199 @@ class Session(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     initial_prompt = Column(Text, nullable=False)
     extracted_keywords = Column(Text)  # Store as JSON string for SQLite compatibility
-    trend_data = Column(Text)  # Store as JSON string for SQLite compatibility
-    refined_prompt = Column(Text)  # Store as JSON string for SQLite compatibility
-    final_prompts = Column(Text)  # Store as JSON string for SQLite compatibility
+    # Legacy blobs: the ad wizard and chat now use the normalized tables below
+    # (migrations backfill them); the /prompt flow still reads and writes these
+    # (deferred: load them explicitly with undefer_group("legacy_blobs"))
+    trend_data = deferred(Column(Text), group="legacy_blobs")  # Store as JSON string for SQLite compatibility
+    refined_prompt = deferred(Column(Text), group="legacy_blobs")  # Store as JSON string for SQLite compatibility
+    final_prompts = deferred(Column(Text), group="legacy_blobs")  # Store as JSON string for SQLite compatibility
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     @property
     def extracted_keywords_json(self):
-        return json.loads(self.extracted_keywords) if self.extracted_keywords else []
+        return json_codec.loads(self.extracted_keywords) if self.extracted_keywords else []
     
     @extracted_keywords_json.setter
     def extracted_keywords_json(self, value):
-        self.extracted_keywords = json.dumps(value) if value else None
+        self.extracted_keywords = json_codec.dumps(value) if value else None
     
     @property
     def trend_data_json(self):
-        return json.loads(self.trend_data) if self.trend_data else {}
+        return json_codec.loads(self.trend_data) if self.trend_data else {}
     
     @trend_data_json.setter
     def trend_data_json(self, value):
-        self.trend_data = json.dumps(value) if value else None
+        self.trend_data = json_codec.dumps(value) if value else None
     
     @property
     def refined_prompt_json(self):
-        return json.loads(self.refined_prompt) if self.refined_prompt else {}
+        return json_codec.loads(self.refined_prompt) if self.refined_prompt else {}
     
     @refined_prompt_json.setter
     def refined_prompt_json(self, value):
-        self.refined_prompt = json.dumps(value) if value else None
+        self.refined_prompt = json_codec.dumps(value) if value else None
     
     @property
     def final_prompts_json(self):
-        return json.loads(self.final_prompts) if self.final_prompts else []
+        return json_codec.loads(self.final_prompts) if self.final_prompts else []
     
     @final_prompts_json.setter
     def final_prompts_json(self, value):
-        self.final_prompts = json.dumps(value) if value else None
+        self.final_prompts = json_codec.dumps(value) if value else None
     
     # Relationships
     generation_jobs = relationship("GenerationJob", back_populates="session")
     images = relationship("GeneratedImage", back_populates="session")
+    product_info = relationship("ProductInfo", back_populates="session", uselist=False)
+    research_results = relationship("ResearchResult", back_populates="session")
+    ideas = relationship("AdIdea", back_populates="session")
+    chat_state = relationship("ChatState", back_populates="session", uselist=False)
+    chat_messages = relationship("ChatMessage", back_populates="session")
+
+
+class ProductInfo(Base):
+    """Step 1 answers for a session (one row per session)"""
+    __tablename__ = "product_info"
+    
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
+    product_name = Column(String)
+    product_type = Column(String)
+    company_name = Column(String)
+    advertising_focus = Column(String)
+    offer_details = Column(Text)
+    business_type = Column(String)
+    business_location = Column(String)
+    target_location = Column(String)
+    target_demographic = Column(String)
+    target_age_group = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    FIELDS = (
+        "product_name", "product_type", "company_name", "advertising_focus", "offer_details",
+        "business_type", "business_location", "target_location", "target_demographic", "target_age_group"
+    )
+    
+    @classmethod
+    def from_dict(cls, session_id, data):
+        row = cls(session_id=session_id)
+        row.update_from(data)
+        return row
+    
+    def update_from(self, data):
+        for field in self.FIELDS:
+            value = data.get(field)
+            setattr(self, field, value if value is None or isinstance(value, str) else json_codec.dumps(value))
+    
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+    
+    session = relationship("Session", back_populates="product_info")
+
+
+class ResearchResult(Base):
+    """One top-level section of a session's research (market_trends, competitor_analysis, ...)"""
+    __tablename__ = "research_results"
+    
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
+    section = Column(String, primary_key=True)
+    data = Column(JSONType)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    session = relationship("Session", back_populates="research_results")
+
+
+class AdIdea(Base):
+    """An ad idea offered to the user; idea IDs are only unique within a session"""
+    __tablename__ = "ad_ideas"
+    
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
+    idea_id = Column(String, primary_key=True)
+    position = Column(Integer, default=0)
+    name = Column(String)
+    type = Column(String)  # "trending", "experimental", "user_preference"
+    description = Column(Text)
+    theme = Column(String)
+    key_elements = Column(JSONType)
+    color_palette = Column(JSONType)
+    estimated_effectiveness = Column(Float)
+    rationale = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    FIELDS = (
+        "name", "type", "description", "theme", "key_elements",
+        "color_palette", "estimated_effectiveness", "rationale"
+    )
+    
+    @classmethod
+    def from_dict(cls, session_id, position, idea):
+        return cls(
+            session_id=session_id,
+            idea_id=str(idea["id"]),
+            position=position,
+            **{field: idea.get(field) for field in cls.FIELDS}
+        )
+    
+    def to_dict(self):
+        idea = {"id": self.idea_id}
+        idea.update({field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None})
+        return idea
+    
+    session = relationship("Session", back_populates="ideas")
+
+
+class ChatState(Base):
+    """Small per-session conversation state; the messages themselves live in chat_messages"""
+    __tablename__ = "chat_states"
+    
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
+    stage = Column(String, default="gathering_info")
+    current_question_index = Column(Integer, default=0)
+    collected_data = Column(JSONType)
+    generated_images = Column(JSONType)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    session = relationship("Session", back_populates="chat_state")
+
+
+class ChatMessage(Base):
+    """Append-only chat log; `sequence` orders messages within a session"""
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_session_sequence", "session_id", "sequence", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String, ForeignKey("sessions.id"), nullable=False)
+    sequence = Column(Integer, nullable=False)
+    role = Column(String, nullable=False)  # "user" or "assistant"
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    session = relationship("Session", back_populates="chat_messages")
+
+
+class KeywordFrequency(Base):
+    """How many stored session prompts contain `term` (keyword ranking corpus)"""
+    __tablename__ = "keyword_frequencies"
+    
+    # The row for this term holds the number of prompts counted
+    CORPUS_SIZE_TERM = ""
+    
+    term = Column(String, primary_key=True)
+    document_count = Column(Integer, nullable=False)
 
 
 class GenerationJob(Base):
     __tablename__ = "generation_jobs"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    session_id = Column(String, ForeignKey("sessions.id"))
-    status = Column(Enum(JobStatus), default=JobStatus.PENDING)
+    session_id = Column(String, ForeignKey("sessions.id"), index=True)
+    status = Column(Enum(JobStatus), default=JobStatus.PENDING, index=True)
+    idea_id = Column(String, index=True)  # Idea (from session.final_prompts) this job renders
+    variation_index = Column(Integer, default=0)
     prompt_used = Column(Text)
     error_message = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -83,18 +228,25 @@ class GeneratedImage(Base):
     __tablename__ = "generated_images"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    session_id = Column(String, ForeignKey("sessions.id"))
-    job_id = Column(String, ForeignKey("generation_jobs.id"))
+    session_id = Column(String, ForeignKey("sessions.id"), index=True)
+    job_id = Column(String, ForeignKey("generation_jobs.id"), index=True)
+    idea_id = Column(String, index=True)
+    variation_index = Column(Integer, default=0)
     image_url = Column(String, nullable=False)
     thumbnail_url = Column(String)
     prompt_used = Column(Text)
-    analysis = Column(JSON)  # AI-generated analysis of the image
-    image_metadata = Column(JSON)  # Additional metadata (dimensions, format, etc.)
+    analysis = Column(JSONType)  # AI-generated analysis of the image
+    image_metadata = Column(JSONType)  # Additional metadata (dimensions, format, etc.)
     is_final = Column(String, default="false")
     parent_image_id = Column(String, ForeignKey("generated_images.id"))  # For edited versions
     edit_instructions = Column(Text)  # Instructions used for editing
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    @property
+    def image_metadata_json(self):
+        # JSONType already decodes older rows that stored an encoded string
+        return self.image_metadata or {}
+    
     # Relationships
     session = relationship("Session", back_populates="images")
     job = relationship("GenerationJob", back_populates="images")
@@ -106,6 +258,6 @@ class TrendCache(Base):
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     cache_key = Column(String, unique=True, index=True)
-    data = Column(JSON)
+    data = Column(JSONType)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    expires_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True), index=True)  # expired rows are purged on write
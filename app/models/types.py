@@ -0,0 +1,25 @@
+"""
+Custom column types.
+"""
+from sqlalchemy.types import JSON, TypeDecorator
+
+from app.core import json_codec
+
+
+class JSONType(TypeDecorator):
+    """
+    JSON column encoded with the shared codec (the engines pass
+    json_codec.dumps/loads as json_serializer/json_deserializer).
+    Older rows stored a JSON document encoded a second time as a string;
+    those are decoded on load so callers always get the structure back.
+    """
+    impl = JSON
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, str) and value[:1] in ("{", "["):
+            try:
+                return json_codec.loads(value)
+            except ValueError:
+                return value
+        return value
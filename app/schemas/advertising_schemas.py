@@ -122,6 +122,7 @@ class GeneratedAd(BaseModel):
     idea_id: str
     image_url: str
     thumbnail_url: Optional[str] = None
+    renditions: Optional[Dict[str, str]] = None  # rendition name -> URL (thumb, preview, meta_feed, ...)
     prompt_used: str
     performance_prediction: Optional[Dict[str, float]] = None
     created_at: datetime
@@ -133,3 +134,13 @@ class AdGenerationStatus(BaseModel):
     progress: Optional[int] = None
     result: Optional[GeneratedAd] = None
     error: Optional[str] = None
+
+
+class AdStatusBatchRequest(BaseModel):
+    job_ids: Optional[List[str]] = Field(default=None, max_length=500)
+    session_id: Optional[str] = None
+
+
+class AdStatusBatchResponse(BaseModel):
+    statuses: List[AdGenerationStatus]
+    missing_job_ids: List[str] = []
@@ -12,14 +12,23 @@ class ConversationStage(str, Enum):
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
     content: str
+    sequence: Optional[int] = None  # Position in the session's chat log
 
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    cursor: Optional[int] = None  # Last sequence the client has; also returns anything newer
 
 class ChatResponse(BaseModel):
     session_id: str
     response: str
     stage: ConversationStage
-    conversation_history: List[ChatMessage]
-    ideas: Optional[List[Dict[str, Any]]] = None
\ No newline at end of file
+    messages: List[ChatMessage]  # Only messages the client has not seen yet
+    cursor: int  # Sequence of the last message returned; send it back with the next request
+    has_more: bool = False  # Catch-up was capped; page on with /chat/{session_id}/history?after=cursor
+    ideas: Optional[List[Dict[str, Any]]] = None
+
+class ChatHistoryResponse(BaseModel):
+    session_id: str
+    messages: List[ChatMessage]
+    has_more: bool  # Another page exists in the requested direction
\ No newline at end of file
@@ -35,9 +35,22 @@ class ClarifyingQuestion(BaseModel):
 class PromptStartResponse(BaseModel):
     session_id: str
     extracted_keywords: List[str]
+    keyword_scores: Dict[str, float] = {}  # TF-IDF score per extracted keyword
+    keyword_source: Optional[str] = None  # "spacy" or "regex"
     questions: List[ClarifyingQuestion]
 
 
+class KeywordBatchRequest(BaseModel):
+    texts: Optional[List[str]] = None
+    session_ids: Optional[List[str]] = None  # re-extract and store keywords for these sessions
+
+
+class KeywordBatchResponse(BaseModel):
+    keywords: List[List[str]] = []  # aligned with texts
+    sessions: Dict[str, List[str]] = {}
+    missing_session_ids: List[str] = []
+
+
 # Phase 2 - Refining
 class PromptRefineRequest(BaseModel):
     session_id: str
@@ -0,0 +1,77 @@
+"""
+Builds the ad generation status payloads shared by the polling endpoint,
+the status stream and the generation pool's published events.
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+from app.schemas import advertising_schemas as schemas
+
+TERMINAL_STATUSES = {models.JobStatus.COMPLETED.value, models.JobStatus.FAILED.value}
+
+DEFAULT_PERFORMANCE_PREDICTION = {
+    "engagement_score": 0.75,
+    "conversion_likelihood": 0.68,
+    "brand_alignment": 0.82
+}
+
+
+def build_status(
+    job: models.GenerationJob,
+    image: Optional[models.GeneratedImage]
+) -> schemas.AdGenerationStatus:
+    result = None
+    if job.status == models.JobStatus.COMPLETED and image:
+        result = schemas.GeneratedAd(
+            ad_id=image.id,
+            idea_id=job.idea_id or "unknown",
+            image_url=image.image_url,
+            thumbnail_url=image.thumbnail_url,
+            renditions=image.image_metadata_json.get("renditions"),
+            prompt_used=image.prompt_used,
+            performance_prediction=DEFAULT_PERFORMANCE_PREDICTION,
+            created_at=image.created_at
+        )
+
+    return schemas.AdGenerationStatus(
+        job_id=job.id,
+        status=job.status.value,
+        result=result,
+        error=job.error_message
+    )
+
+
+async def get_statuses(
+    db: AsyncSession,
+    job_ids: Optional[List[str]] = None,
+    session_id: Optional[str] = None
+) -> List[schemas.AdGenerationStatus]:
+    """
+    Resolve many jobs with one indexed query: jobs joined to their image.
+    Filters by job IDs, a session, or both.
+    """
+    query = (
+        select(models.GenerationJob, models.GeneratedImage)
+        .outerjoin(models.GeneratedImage, models.GeneratedImage.job_id == models.GenerationJob.id)
+    )
+    if job_ids is not None:
+        query = query.where(models.GenerationJob.id.in_(job_ids))
+    if session_id is not None:
+        query = query.where(models.GenerationJob.session_id == session_id)
+    
+    rows = await db.execute(query.order_by(models.GenerationJob.created_at))
+    statuses: Dict[str, schemas.AdGenerationStatus] = {}
+    for job, image in rows.all():
+        # Edited images share the job; the first row per job wins
+        if job.id not in statuses:
+            statuses[job.id] = build_status(job, image)
+    
+    return list(statuses.values())
+
+
+def to_event(status: schemas.AdGenerationStatus) -> Dict[str, Any]:
+    """JSON-ready event published on the session channel"""
+    return {"type": "job_status", **status.model_dump(mode="json")}
@@ -1,78 +1,141 @@
+import logging
 import google.generativeai as genai
 from app.core.config import settings
-from app.services import image_generation_service, research_service, ad_generation_service
+from app.services import image_generation_service, session_store
 from app.models import models
-from sqlalchemy.orm import Session
-import json
-from typing import List, Dict, Any, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 if settings.GEMINI_API_KEY:
     genai.configure(api_key=settings.GEMINI_API_KEY)
 
+REQUIRED_FIELDS = [
+    {"name": "product_type", "prompt": "First, what type of product are you advertising?"},
+    {"name": "company_name", "prompt": "Great! What is your company's name?"},
+    {"name": "advertising_focus", "prompt": "What is the focus of your ad? (e.g., the company, a specific product, or an offer)"},
+    {"name": "offer_details", "prompt": "What are the details of the offer?", "depends_on": "advertising_focus", "depends_on_value": "offer"},
+    {"name": "business_type", "prompt": "What type of business is it? (optional)"},
+    {"name": "business_location", "prompt": "Where is your business located? (optional)"},
+    {"name": "target_location", "prompt": "What location are you targeting? (optional)"},
+    {"name": "target_demographic", "prompt": "Who is your target demographic? (optional)"},
+    {"name": "target_age_group", "prompt": "What is the target age group? (optional)"},
+    {"name": "budget", "prompt": "What is your budget for this campaign?"}
+]
+
+# Upper bound on messages returned to a client catching up from an old cursor
+MAX_CATCH_UP_MESSAGES = 200
+
+# Attempts to save a turn when another tab wrote to the session concurrently
+SAVE_ATTEMPTS = 3
+
+# Stages after which the session has ideas worth loading
+IDEA_STAGES = {"showing_ideas", "completed"}
+
+
 class ConversationalAgent:
-    def __init__(self, session_id: str, db: Session):
+    def __init__(self, session_id: str, db: AsyncSession, state: models.ChatState, ideas: List[Dict[str, Any]]):
         self.session_id = session_id
         self.db = db
-        self.session = self.db.query(models.Session).filter(models.Session.id == self.session_id).first()
-        if not self.session:
-            self.session = models.Session(id=self.session_id, initial_prompt="Chat session")
-            self.db.add(self.session)
-            self.db.commit()
+        self.state = state
+        # Work on copies so changes to the JSON columns are detected on save
+        self.conversation_state = {
+            "stage": state.stage or "gathering_info",
+            "collected_data": dict(state.collected_data or {}),
+            "required_fields": REQUIRED_FIELDS,
+            "current_question_index": state.current_question_index or 0,
+            "ideas": ideas,
+            "generated_images": list(state.generated_images or []),
+        }
+        # Only this turn's messages are written; earlier ones are never rewritten
+        self.new_messages: List[Tuple[str, str]] = []
+
+    @classmethod
+    async def load(cls, session_id: str, db: AsyncSession) -> "ConversationalAgent":
+        """Fetch (or create) the chat session and build an agent around it"""
+        session = await db.get(models.Session, session_id)
+        if not session:
+            session = models.Session(id=session_id, initial_prompt="Chat session")
+            db.add(session)
+            await db.commit()
         
-        self.conversation_state = json.loads(self.session.refined_prompt) if self.session.refined_prompt and self.session.refined_prompt.startswith('{') else self._get_initial_state()
+        state = await cls._get_or_add_state(session_id, db)
+        ideas = await session_store.get_ideas(db, session_id) if state.stage in IDEA_STAGES else []
+        return cls(session_id, db, state, ideas)
 
-    def _get_initial_state(self):
-        return {
-            "stage": "gathering_info",
-            "collected_data": {},
-            "required_fields": [
-                {"name": "product_type", "prompt": "First, what type of product are you advertising?"},
-                {"name": "company_name", "prompt": "Great! What is your company's name?"},
-                {"name": "advertising_focus", "prompt": "What is the focus of your ad? (e.g., the company, a specific product, or an offer)"},
-                {"name": "offer_details", "prompt": "What are the details of the offer?", "depends_on": "advertising_focus", "depends_on_value": "offer"},
-                {"name": "business_type", "prompt": "What type of business is it? (optional)"},
-                {"name": "business_location", "prompt": "Where is your business located? (optional)"},
-                {"name": "target_location", "prompt": "What location are you targeting? (optional)"},
-                {"name": "target_demographic", "prompt": "Who is your target demographic? (optional)"},
-                {"name": "target_age_group", "prompt": "What is the target age group? (optional)"},
-                {"name": "budget", "prompt": "What is your budget for this campaign?"}
-            ],
-            "current_question_index": 0,
-            "conversation_history": [],
-            "ideas": [],
-        }
+    @staticmethod
+    async def _get_or_add_state(session_id: str, db: AsyncSession) -> models.ChatState:
+        state = await session_store.get_chat_state(db, session_id)
+        if state is None:
+            state = models.ChatState(session_id=session_id, stage="gathering_info", current_question_index=0, collected_data={})
+            db.add(state)
+        return state
 
-    def _save_state(self):
-        self.session.refined_prompt = json.dumps(self.conversation_state)
-        self.db.commit()
+    async def _save_state(self) -> List[models.ChatMessage]:
+        for attempt in range(SAVE_ATTEMPTS):
+            if attempt:
+                # Another tab took the same message sequence (or created the chat
+                # state) first; rolled back, so save this turn on top of its rows
+                self.state = await self._get_or_add_state(self.session_id, self.db)
+            self.state.stage = self.conversation_state["stage"]
+            self.state.current_question_index = self.conversation_state["current_question_index"]
+            self.state.collected_data = self.conversation_state["collected_data"]
+            self.state.generated_images = self.conversation_state["generated_images"]
+            rows = await session_store.append_messages(self.db, self.session_id, self.new_messages)
+            try:
+                await self.db.commit()
+                return rows
+            except IntegrityError:
+                await self.db.rollback()
+                if attempt == SAVE_ATTEMPTS - 1:
+                    raise
 
     def _add_to_history(self, role: str, content: str):
-        self.conversation_state["conversation_history"].append({"role": role, "content": content})
+        self.new_messages.append((role, content))
 
-    def process_message(self, user_message: str) -> Dict[str, Any]:
+    async def process_message(self, user_message: str, cursor: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Handle one user turn. Returns this turn's messages, or everything after
+        `cursor` when the client passes the last sequence it has seen (at most
+        MAX_CATCH_UP_MESSAGES; `has_more` says to page on from the returned cursor).
+        """
         self._add_to_history("user", user_message)
 
         if self.conversation_state["stage"] == "gathering_info":
-            response_text = self._handle_gathering_info(user_message)
+            response_text = await self._handle_gathering_info(user_message)
         elif self.conversation_state["stage"] == "awaiting_preferences":
-            response_text = self._handle_preferences(user_message)
+            response_text = await self._handle_preferences(user_message)
         elif self.conversation_state["stage"] == "showing_ideas":
-            response_text = self._handle_idea_selection(user_message)
+            response_text = await self._handle_idea_selection(user_message)
         else:
             response_text = "I'm not sure how to handle that right now."
 
         self._add_to_history("assistant", response_text)
-        self._save_state()
+        messages = await self._save_state()
+        has_more = False
+        if cursor is not None and cursor < messages[0].sequence - 1:
+            # The client missed messages (e.g. another tab); catch it up.
+            # One extra row tells us whether the cap cut the backlog short
+            messages = await session_store.get_messages(
+                self.db, self.session_id, after=cursor, limit=MAX_CATCH_UP_MESSAGES + 1
+            )
+            has_more = len(messages) > MAX_CATCH_UP_MESSAGES
+            messages = messages[:MAX_CATCH_UP_MESSAGES]
         
         return {
             "session_id": self.session_id,
             "response": response_text,
             "stage": self.conversation_state["stage"],
-            "conversation_history": self.conversation_state["conversation_history"],
+            "messages": messages,
+            # Never past what was sent, so a capped catch-up leaves no gap
+            "cursor": messages[-1].sequence,
+            "has_more": has_more,
             "ideas": self.conversation_state.get("ideas")
         }
 
-    def _handle_gathering_info(self, user_message: str) -> str:
+    async def _handle_gathering_info(self, user_message: str) -> str:
         current_question_index = self.conversation_state["current_question_index"]
         
         if current_question_index > 0:
@@ -85,19 +148,18 @@ class ConversationalAgent:
             # Skip optional questions if the user types "skip"
             if "optional" in next_question.get("prompt", "") and user_message.lower() == "skip":
                 self.conversation_state["current_question_index"] += 1
-                return self._handle_gathering_info(user_message)
+                return await self._handle_gathering_info(user_message)
 
             self.conversation_state["current_question_index"] += 1
             return next_question["prompt"]
         else:
-            # All information gathered, now conduct research
-            self.session.trend_data = json.dumps(self.conversation_state["collected_data"])
-            self.db.commit()
+            # All information gathered; it doubles as the session's product info
+            await session_store.save_product_info(self.db, self.session_id, self.conversation_state["collected_data"])
             
             self.conversation_state["stage"] = "awaiting_preferences"
             return "Thanks for all the information! Now, let's talk about the ad's style. Do you want to include any text in the ad?"
 
-    def _handle_preferences(self, user_message: str) -> str:
+    async def _handle_preferences(self, user_message: str) -> str:
         # For simplicity, we'll just ask about themes for now.
         # This can be expanded to ask more questions.
         if "text" not in self.conversation_state["collected_data"]:
@@ -108,9 +170,7 @@ class ConversationalAgent:
             self.conversation_state["stage"] = "showing_ideas"
             
             # Generate ad ideas
-            research_data = json.loads(self.session.trend_data)
-            print(f"Collected data: {self.conversation_state['collected_data']}")
-            print(f"Research data: {research_data}")
+            logger.debug(f"Collected data: {self.conversation_state['collected_data']}")
             
             # Simple mock ideas for testing
             self.conversation_state["ideas"] = [
@@ -136,6 +196,7 @@ class ConversationalAgent:
                     "key_elements": ["coffee beans", "brewing process", "premium packaging"]
                 }
             ]
+            await session_store.save_ideas(self.db, self.session_id, self.conversation_state["ideas"])
 
             response_text = "Based on your preferences and my research, here are a few ideas for your ad:\n\n"
             for i, idea in enumerate(self.conversation_state["ideas"]):
@@ -143,7 +204,7 @@ class ConversationalAgent:
             response_text += "\nPlease select one or more ideas by number (e.g., '1' or '1, 3')."
             return response_text
 
-    def _handle_idea_selection(self, user_message: str) -> str:
+    async def _handle_idea_selection(self, user_message: str) -> str:
         try:
             selected_indices = [int(i.strip()) - 1 for i in user_message.split(',')]
             selected_ideas = [self.conversation_state["ideas"][i] for i in selected_indices]
@@ -152,11 +213,11 @@ class ConversationalAgent:
             image_details = []
             
             for i, idea in enumerate(selected_ideas):
-                print(f"Generating image {i+1} for idea: {idea['name']}")
+                logger.debug(f"Generating image {i+1} for idea: {idea['name']}")
                 
                 # Create structured prompt for DALL-E
                 prompt = self._create_dalle_prompt(idea)
-                print(f"DALL-E Prompt: {prompt}")
+                logger.debug(f"DALL-E Prompt: {prompt}")
                 
                 # Generate image using your DALL-E service
                 style_params = {
@@ -164,7 +225,7 @@ class ConversationalAgent:
                     "mood": "professional and engaging"
                 }
                 
-                image_data = image_generation_service.generate_image(prompt, style_params)
+                image_data = await image_generation_service.generate_image_async(prompt, style_params)
                 
                 if image_data and "url" in image_data:
                     generated_images.append(image_data["url"])
@@ -174,9 +235,9 @@ class ConversationalAgent:
                         "thumbnail_url": image_data.get("thumbnail_url"),
                         "analysis": image_data.get("analysis", {})
                     })
-                    print(f"✅ Successfully generated image for '{idea['name']}'")
+                    logger.debug(f"✅ Successfully generated image for '{idea['name']}'")
                 else:
-                    print(f"❌ Failed to generate image for '{idea['name']}'")
+                    logger.debug(f"❌ Failed to generate image for '{idea['name']}'")
             
             # Store generated images in conversation state
             self.conversation_state["generated_images"] = image_details
@@ -200,7 +261,7 @@ class ConversationalAgent:
         except (ValueError, IndexError) as e:
             return "Please provide valid numbers corresponding to the ideas you'd like (e.g., '1' or '1, 3')."
         except Exception as e:
-            print(f"Error in idea selection: {str(e)}")
+            logger.exception(f"Error in idea selection: {str(e)}")
             return "I encountered an error while generating your images. Please try again."
 
     def _create_dalle_prompt(self, idea: Dict[str, Any]) -> str:
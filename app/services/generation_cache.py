@@ -0,0 +1,50 @@
+"""
+Opt-in cache of image generation results.
+
+Prompts built by create_image_prompt are deterministic, so retries and demo
+sessions keep asking the provider for the same image. Entries are keyed by the
+normalized prompt plus the provider parameters and a seed bucket (the variation
+index), so N variations of one idea still map to N distinct images.
+Enable with GENERATION_CACHE_ENABLED.
+"""
+import copy
+import hashlib
+import re
+from typing import Any, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+_WHITESPACE = re.compile(r"\s+")
+
+_cache = TTLCache(
+    maxsize=settings.GENERATION_CACHE_MAX_ENTRIES,
+    ttl=settings.GENERATION_CACHE_TTL,
+)
+
+
+def is_enabled() -> bool:
+    return settings.GENERATION_CACHE_ENABLED
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _WHITESPACE.sub(" ", prompt).strip().lower()
+
+
+def make_key(prompt: str, model: str, size: str, quality: str, seed_bucket: int = 0) -> str:
+    raw = "|".join([normalize_prompt(prompt), model, size, quality, str(seed_bucket)])
+    return f"generation:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    result = _cache.get(key)
+    # Callers annotate the result, so never hand out the cached dict itself
+    return copy.deepcopy(result) if result is not None else None
+
+
+def put(key: str, result: Dict[str, Any]) -> None:
+    _cache.set(key, copy.deepcopy(result))
+
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": is_enabled(), **_cache.stats()}
@@ -0,0 +1,143 @@
+"""
+In-process image generation pool.
+
+Jobs created by /generate-ads are processed in parallel, bounded by
+IMAGE_GENERATION_CONCURRENCY. Provider calls are awaited natively over the
+shared connection pool, database work goes through the async session layer,
+and each job commits its own result as soon as it finishes. Every status transition is
+published on the session's event channel for the status stream.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from app.core import events
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models import models
+from app.services import ad_status_service, image_generation_service, session_store
+
+logger = logging.getLogger(__name__)
+
+_semaphore: Optional[asyncio.Semaphore] = None
+# Keep strong references so scheduled batches are not garbage collected mid-run
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, settings.IMAGE_GENERATION_CONCURRENCY))
+    return _semaphore
+
+
+async def _start_job(job_id: str) -> Optional[Tuple[str, str, Dict[str, Any], Dict[str, Any]]]:
+    """
+    Mark a job as processing.
+    Returns its session ID, prompt, research data and the status event to publish.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await db.get(models.GenerationJob, job_id)
+        if not job:
+            logger.error(f"Job {job_id} not found")
+            return None
+
+        job.status = models.JobStatus.PROCESSING
+        await db.commit()
+
+        # Only the research section the image service uses
+        research_data = await session_store.get_research(db, job.session_id, ["market_trends"])
+        event = ad_status_service.to_event(ad_status_service.build_status(job, None))
+        return job.session_id, job.prompt_used, research_data, event
+
+
+async def _finish_job(job_id: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Persist the outcome of a job and return the status event to publish"""
+    async with AsyncSessionLocal() as db:
+        job = await db.get(models.GenerationJob, job_id)
+        if not job:
+            return None
+
+        image = None
+        if error is None:
+            image = models.GeneratedImage(
+                id=str(uuid.uuid4()),
+                session_id=job.session_id,
+                job_id=job_id,
+                idea_id=job.idea_id,
+                variation_index=job.variation_index,
+                image_url=result["url"],
+                thumbnail_url=result["thumbnail_url"],
+                prompt_used=job.prompt_used,
+                analysis=result["analysis"],
+                image_metadata=result["metadata"]
+            )
+            db.add(image)
+            job.status = models.JobStatus.COMPLETED
+        else:
+            job.status = models.JobStatus.FAILED
+            job.error_message = error
+        job.completed_at = datetime.utcnow()
+        await db.commit()
+
+        return ad_status_service.to_event(ad_status_service.build_status(job, image))
+
+
+async def _publish(session_id: str, event: Optional[Dict[str, Any]]) -> None:
+    if event is None:
+        return
+    try:
+        await events.get_broker().publish(events.session_channel(session_id), event)
+    except Exception as e:
+        # Streams are best-effort; the database stays the source of truth
+        logger.warning(f"Could not publish status for job {event.get('job_id')}: {str(e)}")
+
+
+async def _process_job(job_id: str, seed_bucket: int = 0) -> None:
+    async with _get_semaphore():
+        try:
+            started = await _start_job(job_id)
+            if started is None:
+                return
+            session_id, prompt, research_data, event = started
+            await _publish(session_id, event)
+
+            result, error = None, None
+            try:
+                # Native async provider call over the shared pool; no session is held meanwhile
+                result = await image_generation_service.generate_image_async(
+                    prompt=prompt,
+                    style_params={
+                        "style": "professional advertisement",
+                        "mood": "engaging"
+                    },
+                    research_data=research_data,
+                    seed_bucket=seed_bucket
+                )
+            except Exception as e:
+                logger.error(f"Error generating image for job {job_id}: {str(e)}")
+                error = str(e)
+
+            event = await _finish_job(job_id, result, error)
+            await _publish(session_id, event)
+        except Exception:
+            logger.exception(f"Generation worker crashed for job {job_id}")
+
+
+async def run_jobs(job_ids: Iterable[str], seed_buckets: Optional[Dict[str, int]] = None) -> None:
+    """
+    Process a batch of generation jobs, at most IMAGE_GENERATION_CONCURRENCY at a time.
+    `seed_buckets` maps job IDs to their variation index (used by the generation cache).
+    """
+    seed_buckets = seed_buckets or {}
+    await asyncio.gather(*(_process_job(job_id, seed_buckets.get(job_id, 0)) for job_id in job_ids))
+
+
+def submit(job_ids: Iterable[str], seed_buckets: Optional[Dict[str, int]] = None) -> asyncio.Task:
+    """Schedule a batch of jobs on the running event loop and return immediately"""
+    task = asyncio.create_task(run_jobs(list(job_ids), seed_buckets))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
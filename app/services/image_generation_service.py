@@ -1,10 +1,12 @@
 import openai
-import httpx
-from typing import Dict, Any, Optional
+import aiofiles
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional, Tuple
 from app.core.config import settings
+from app.core import http_client
+from app.services import generation_cache, rendition_service, storage_service
 import uuid
-from PIL import Image
-import io
 import base64
 import os
 
@@ -12,84 +14,112 @@ import os
 if settings.OPENAI_API_KEY:
     openai.api_key = settings.OPENAI_API_KEY
 
+# Provider parameters (also part of the generation cache key)
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1024"
+IMAGE_QUALITY = "hd"
 
-def generate_image(prompt: str, style_params: Dict[str, Any], research_data: Dict[str, Any] = None) -> Dict[str, Any]:
+
+async def generate_image_async(prompt: str, style_params: Dict[str, Any], research_data: Dict[str, Any] = None,
+                               seed_bucket: int = 0) -> Dict[str, Any]:
     """
     Generate an image using AI models.
     This is a modular function that can use different AI providers.
+    Provider calls and downloads share the pooled clients from app.core.http_client.
+    `seed_bucket` separates variations of the same prompt in the generation cache.
     """
     # For now, we'll use OpenAI's DALL-E 3
     # In production, you can switch between different providers
     
+    cache_key = None
+    if generation_cache.is_enabled():
+        cache_key = generation_cache.make_key(prompt, IMAGE_MODEL, IMAGE_SIZE, IMAGE_QUALITY, seed_bucket)
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            cached["metadata"]["cache_hit"] = True
+            return cached
+    
     try:
         # Generate image with DALL-E 3
-        response = openai.images.generate(
-            model="dall-e-3",
+        response = await http_client.get_openai_client().images.generate(
+            model=IMAGE_MODEL,
             prompt=prompt,
-            size="1024x1024",
-            quality="hd",
+            size=IMAGE_SIZE,
+            quality=IMAGE_QUALITY,
             n=1
         )
         
         # Get the temporary URL from OpenAI
         temp_image_url = response.data[0].url
         
-        # Download the image
-        image_data = download_image(temp_image_url)
-        
-        # Create local storage directory if it doesn't exist
-        storage_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "static", "generated")
-        os.makedirs(storage_dir, exist_ok=True)
-        
-        # Generate unique filename
-        image_id = str(uuid.uuid4())
-        image_filename = f"{image_id}.png"
-        image_path = os.path.join(storage_dir, image_filename)
-        
-        # Save the image
-        with open(image_path, "wb") as f:
-            f.write(image_data)
-        
-        # Create thumbnail
-        thumbnail_data = create_thumbnail(image_data)
-        thumbnail_filename = f"{image_id}_thumb.png"
-        thumbnail_path = os.path.join(storage_dir, thumbnail_filename)
-        
-        with open(thumbnail_path, "wb") as f:
-            f.write(thumbnail_data)
+        # Stream the image into the store's staging area, hashing it as it arrives
+        staged_path = storage_service.staging_path("png")
+        digest = await download_image_to_file_async(temp_image_url, staged_path)
+        
+        # Decode once in the rendition process pool: every size/format plus basic image facts
+        staging_dir = os.path.dirname(staged_path)
+        stem = os.path.splitext(os.path.basename(staged_path))[0]
+        try:
+            rendition_info = await rendition_service.create_renditions_async(staged_path, staging_dir, stem)
+        except Exception:
+            os.remove(staged_path)
+            raise
+        
+        # Move the original and its renditions into the content-addressed store;
+        # identical bytes from edits or repeated variations are stored only once
+        stored, stored_renditions = await asyncio.to_thread(
+            _store_outputs, staged_path, digest, staging_dir, rendition_info["files"]
+        )
+        renditions = {name: obj.url for name, obj in stored_renditions.items()}
         
-        # Return local URLs
-        image_url = f"/static/generated/{image_filename}"
-        thumbnail_url = f"/static/generated/{thumbnail_filename}"
+        image_url = stored.url
+        thumbnail_url = renditions.get("thumb") or image_url
         
         # Generate basic analysis (in production, use a Vision model)
         analysis = {
             "description": f"AI-generated image based on prompt: {prompt[:100]}...",
             "style": style_params.get("style", "default"),
             "mood": style_params.get("mood", "neutral"),
-            "dominant_colors": ["varies"],  # Would analyze in production
+            "dominant_colors": rendition_info["dominant_colors"],
             "objects_detected": []  # Would use vision AI in production
         }
         
-        return {
+        result = {
             "url": image_url,
             "thumbnail_url": thumbnail_url,
+            "renditions": renditions,
             "analysis": analysis,
             "metadata": {
                 "provider": "openai",
-                "model": "dall-e-3",
-                "dimensions": "1024x1024",
+                "model": IMAGE_MODEL,
+                "dimensions": f"{rendition_info['width']}x{rendition_info['height']}",
                 "format": "png",
-                "local_path": image_path
+                "storage_key": stored.key,
+                "content_hash": stored.digest,
+                "deduplicated": stored.deduplicated,
+                "renditions": renditions,
+                "rendition_keys": {name: obj.key for name, obj in stored_renditions.items()}
             }
         }
         
+        # Only real provider results are cached; mock fallbacks never are
+        if cache_key:
+            generation_cache.put(cache_key, result)
+        
+        return result
+        
     except Exception as e:
         print(f"Error generating image: {str(e)}")
         # Fallback to alternative provider or mock data
         return generate_mock_image(prompt, style_params)
 
 
+def generate_image(prompt: str, style_params: Dict[str, Any], research_data: Dict[str, Any] = None,
+                   seed_bucket: int = 0) -> Dict[str, Any]:
+    """Blocking wrapper around generate_image_async for Celery tasks and other sync callers"""
+    return http_client.run_sync(generate_image_async(prompt, style_params, research_data, seed_bucket))
+
+
 def edit_image(source_url: str, edit_instructions: str) -> Dict[str, Any]:
     """
     Edit an existing image based on instructions.
@@ -112,39 +142,49 @@ def edit_image(source_url: str, edit_instructions: str) -> Dict[str, Any]:
         return generate_mock_image(f"Edited: {edit_instructions}", {})
 
 
-def download_image(url: str) -> bytes:
-    """Download image from URL"""
-    response = httpx.get(url)
+async def download_image_async(url: str) -> bytes:
+    """Download image from URL over the shared connection pool"""
+    response = await http_client.get_http_client().get(url)
     response.raise_for_status()
     return response.content
 
 
-def create_thumbnail(image_data: bytes, size: tuple = (256, 256)) -> bytes:
-    """Create a thumbnail from image data"""
-    image = Image.open(io.BytesIO(image_data))
-    image.thumbnail(size, Image.Resampling.LANCZOS)
-    
-    output = io.BytesIO()
-    image.save(output, format='PNG')
-    return output.getvalue()
+def download_image(url: str) -> bytes:
+    """Download image from URL"""
+    return http_client.run_sync(download_image_async(url))
 
 
-def upload_to_s3(data: bytes, key: str) -> str:
-    """Upload image data to S3 and return URL"""
+async def download_image_to_file_async(url: str, path: str, chunk_size: int = 64 * 1024) -> str:
+    """
+    Stream an image from URL to `path` chunk by chunk and return its SHA-256.
+    Writes go to a temporary file that is renamed into place once complete.
+    """
+    tmp_path = f"{path}.part"
+    digest = hashlib.sha256()
     try:
-        s3_client.put_object(
-            Bucket=settings.AWS_BUCKET_NAME,
-            Key=key,
-            Body=data,
-            ContentType='image/png'
-        )
-        
-        # Return public URL
-        return f"https://{settings.AWS_BUCKET_NAME}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
-    except Exception as e:
-        # Fallback to local storage or CDN
-        # In development, return a placeholder
-        return f"https://placeholder.com/{key}"
+        async with http_client.get_http_client().stream("GET", url) as response:
+            response.raise_for_status()
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    await f.write(chunk)
+                    digest.update(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest.hexdigest()
+
+
+def _store_outputs(staged_path: str, digest: str, staging_dir: str,
+                   rendition_files: Dict[str, str]) -> Tuple[storage_service.StoredObject, Dict[str, storage_service.StoredObject]]:
+    """Move a staged original and its renditions into the content-addressed store (blocking)"""
+    stored = storage_service.store_file(staged_path, "png", digest=digest)
+    stored_renditions = {}
+    for name, filename in rendition_files.items():
+        ext = os.path.splitext(filename)[1].lstrip(".")
+        stored_renditions[name] = storage_service.store_file(os.path.join(staging_dir, filename), ext)
+    return stored, stored_renditions
 
 
 def generate_mock_image(prompt: str, style_params: Dict[str, Any], research_data: Dict[str, Any] = None) -> Dict[str, Any]:
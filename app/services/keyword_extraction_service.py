@@ -1,59 +1,307 @@
-from typing import List
+"""
+Keyword extraction for /prompt/start.
+
+The spaCy model is loaded on first use (or by warm_up()), not at import, so API
+and Celery workers that never extract keywords don't pay for it. Only the
+components the extraction reads are loaded: the tagger (via attribute_ruler for
+coarse POS tags) and NER; the dependency parser and lemmatizer are excluded.
+Without spaCy, or with fast=True when the latency budget is tight, a
+precompiled regex/stop-word pass is used instead.
+
+Bulk callers use extract_keywords_batch(), which streams texts through
+nlp.pipe (optionally across processes). Concurrent single requests on the
+API worker go through extract_keywords_async(), which micro-batches them into
+one nlp.pipe call.
+
+Candidates are ranked by TF-IDF against stored session prompts (see
+keyword_ranking) and the top KEYWORD_TOP_K returned. The candidates, not
+the ranking, are memoized by a hash of the normalized text (bounded in-process
+LRU, optionally shared through KEYWORD_MEMO_BACKEND) and tagged with the
+extractor that produced them: "spacy" or "regex".
+"""
+import asyncio
+import hashlib
+import logging
 import re
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.tiered_cache import TieredCache, build_backend
+from app.services import keyword_ranking
+
+logger = logging.getLogger(__name__)
+
+# Not needed for POS tags, stop words or entities
+EXCLUDED_COMPONENTS = ["parser", "lemmatizer", "senter"]
+
+KEYWORD_POS = {"NOUN", "PROPN"}
+ENTITY_LABELS = {"PERSON", "ORG", "GPE", "PRODUCT", "WORK_OF_ART"}
+
+STOP_WORDS = frozenset({
+    "a", "an", "the", "in", "on", "at", "to", "for", "of", "with",
+    "by", "from", "as", "is", "was", "are", "been", "be", "have",
+    "has", "had", "do", "does", "did", "will", "would", "could",
+    "should", "may", "might", "must", "can", "wearing", "holding"
+})
+
+_WORD = re.compile(r"\b\w{3,}\b")
+_WHITESPACE = re.compile(r"\s+")
+
+# Candidates kept per text for ranking (repeats included)
+MAX_CANDIDATES = 100
+
+_nlp: Optional[Any] = None
+_nlp_failed = False
+_nlp_lock = threading.Lock()
+
+# key -> {"candidates": [...], "source": "spacy" | "regex"}; ranking runs after the memo
+keyword_memo = TieredCache(
+    "keywords",
+    backend=build_backend(settings.KEYWORD_MEMO_BACKEND, settings.REDIS_URL, "keywords"),
+    maxsize=settings.KEYWORD_MEMO_MAX_ENTRIES,
+    ttl=settings.KEYWORD_MEMO_TTL,
+)
+
+
+def get_nlp() -> Optional[Any]:
+    """The shared spaCy pipeline, loaded once per process; None if unavailable"""
+    global _nlp, _nlp_failed
+    if _nlp is not None or _nlp_failed:
+        return _nlp
+    with _nlp_lock:
+        if _nlp is None and not _nlp_failed:
+            try:
+                import spacy
+
+                # Install with: python -m spacy download en_core_web_sm
+                _nlp = spacy.load(settings.KEYWORD_SPACY_MODEL, exclude=EXCLUDED_COMPONENTS)
+            except (ImportError, OSError) as e:
+                _nlp_failed = True
+                logger.info(f"spaCy unavailable, using regex keyword extraction: {str(e)}")
+    return _nlp
+
+
+def warm_up() -> None:
+    """Load the model now, e.g. in a worker that does nothing but extraction"""
+    threading.Thread(target=get_nlp, name="spacy-load", daemon=True).start()
+
+
+def _keywords_from_doc(doc: Any) -> List[str]:
+    keywords = [token.text for token in doc if token.pos_ in KEYWORD_POS and not token.is_stop]
+    keywords.extend(ent.text for ent in doc.ents if ent.label_ in ENTITY_LABELS)
+    return keywords
+
+
+def _extract_fallback(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def _expected_source(fast: bool) -> str:
+    # Decided without loading the model, so memo hits never wait for spaCy
+    return "regex" if fast or _nlp_failed else "spacy"
+
+
+def _memo_key(text: str, source: str) -> str:
+    # Keyed by extractor too: a worker without spaCy must not answer for one with it
+    digest = hashlib.sha256(normalize_text(text).encode()).hexdigest()
+    return f"keyword_candidates:{source}:{digest}"
+
+
+def _run_batch(texts: List[str], fast: bool, n_process: int = 1) -> Tuple[List[List[str]], str]:
+    """Uncached candidate extraction for `texts` and the extractor that ran"""
+    nlp = None if fast else get_nlp()
+    if nlp is None:
+        return [_extract_fallback(text)[:MAX_CANDIDATES] for text in texts], "regex"
+
+    batch_size = settings.KEYWORD_BATCH_SIZE
+    if len(texts) < batch_size * n_process:
+        # Starting worker processes costs more than it saves here
+        n_process = 1
+    docs = nlp.pipe((text.lower() for text in texts), batch_size=batch_size, n_process=n_process)
+    return [_keywords_from_doc(doc)[:MAX_CANDIDATES] for doc in docs], "spacy"
+
+
+def _memo_get(text: str, fast: bool) -> Optional[Tuple[List[str], str]]:
+    entry = keyword_memo.local.get(_memo_key(text, _expected_source(fast)))
+    return (entry["candidates"], entry["source"]) if entry is not None else None
+
+
+def _memo_set_local(text: str, candidates: List[str], source: str) -> None:
+    keyword_memo.local.set(_memo_key(text, source), {"candidates": list(candidates), "source": source})
 
-# Try to import spacy, but don't fail if it's not available
-try:
-    import spacy
-    # Load spaCy model - you'll need to download it: python -m spacy download en_core_web_sm
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except:
-        nlp = None
-except ImportError:
-    # Fallback to simple extraction if spaCy not installed
-    nlp = None
 
+def _candidates(text: str, fast: bool) -> Tuple[List[str], str]:
+    cached = _memo_get(text, fast)
+    if cached is not None:
+        return cached
+    results, source = _run_batch([text], fast)
+    _memo_set_local(text, results[0], source)
+    return results[0], source
 
-def extract_keywords(text: str) -> List[str]:
+
+def extract_scored_keywords(
+    text: str,
+    fast: bool = False,
+    top_k: Optional[int] = None
+) -> Tuple[List[Tuple[str, float]], str]:
+    """
+    The top_k (default KEYWORD_TOP_K) keywords of `text` ranked by TF-IDF
+    against the session prompt corpus, as (keyword, score), plus the
+    extractor that produced the candidates ("spacy" or "regex").
+    """
+    candidates, source = _candidates(text, fast)
+    return keyword_ranking.rank(candidates, top_k or settings.KEYWORD_TOP_K), source
+
+
+def extract_keywords(text: str, fast: bool = False, top_k: Optional[int] = None) -> List[str]:
     """
     Extract keywords from the input text using NLP.
-    Returns a list of relevant keywords for trend analysis.
-    """
-    keywords = []
-    
-    if nlp:
-        # Use spaCy for advanced extraction
-        doc = nlp(text.lower())
-        
-        # Extract nouns and proper nouns
-        for token in doc:
-            if token.pos_ in ["NOUN", "PROPN"] and not token.is_stop:
-                keywords.append(token.text)
-        
-        # Extract named entities
-        for ent in doc.ents:
-            if ent.label_ in ["PERSON", "ORG", "GPE", "PRODUCT", "WORK_OF_ART"]:
-                keywords.append(ent.text)
+    Returns a list of relevant keywords for trend analysis, best first.
+    fast=True skips spaCy for the regex/stop-word extraction.
+    """
+    return [keyword for keyword, _ in extract_scored_keywords(text, fast, top_k)[0]]
+
+
+def extract_keywords_batch(
+    texts: List[str],
+    fast: bool = False,
+    n_process: Optional[int] = None,
+    top_k: Optional[int] = None
+) -> List[List[str]]:
+    """
+    extract_keywords() for many texts, in order, through one nlp.pipe stream.
+    n_process defaults to KEYWORD_N_PROCESS; small inputs always run in-process.
+    Memoized texts are answered without going through the pipeline.
+    """
+    candidates: List[Optional[List[str]]] = []
+    misses: List[int] = []
+    for index, text in enumerate(texts):
+        cached = _memo_get(text, fast)
+        candidates.append(cached[0] if cached is not None else None)
+        if cached is None:
+            misses.append(index)
+
+    if misses:
+        computed, source = _run_batch([texts[index] for index in misses], fast, n_process or settings.KEYWORD_N_PROCESS)
+        for index, text_candidates in zip(misses, computed):
+            candidates[index] = text_candidates
+            _memo_set_local(texts[index], text_candidates, source)
+
+    corpus = keyword_ranking.get_corpus()
+    top_k = top_k or settings.KEYWORD_TOP_K
+    return [
+        [keyword for keyword, _ in keyword_ranking.rank(text_candidates, top_k, corpus)]
+        for text_candidates in candidates
+    ]
+
+
+class MicroBatcher:
+    """
+    Collects concurrent extract_keywords_async() calls on one event loop and
+    runs them as a single extract_keywords_batch() in a worker thread, after
+    KEYWORD_MICROBATCH_WAIT_MS or once KEYWORD_MICROBATCH_SIZE texts are queued.
+    """
+
+    def __init__(self):
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, text: str) -> Tuple[List[str], str]:
+        """Candidates for `text` and the extractor that produced them"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= settings.KEYWORD_MICROBATCH_SIZE:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(settings.KEYWORD_MICROBATCH_WAIT_MS / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.texts += len(batch)
+        try:
+            results, source = await asyncio.to_thread(_run_batch, [text for text, _ in batch], False)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), candidates in zip(batch, results):
+            if not future.done():
+                future.set_result((candidates, source))
+
+
+_batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MicroBatcher]" = weakref.WeakKeyDictionary()
+
+
+async def _candidates_async(text: str, fast: bool) -> Tuple[List[str], str]:
+    # Memo (local, then shared), else spaCy micro-batched off the event loop
+    cached = _memo_get(text, fast)
+    if cached is not None:
+        return cached
+
+    # _memo_get already missed in L1, so only ask the shared tier
+    entry = await keyword_memo.get_shared(_memo_key(text, _expected_source(fast)))
+    if entry is not None:
+        return entry["candidates"], entry["source"]
+
+    if fast or _nlp_failed:
+        # The regex pass is cheaper than a thread hop
+        results, source = _run_batch([text], True)
+        candidates = results[0]
     else:
-        # Fallback: Simple keyword extraction
-        # Remove common words and extract significant terms
-        stop_words = {
-            "a", "an", "the", "in", "on", "at", "to", "for", "of", "with",
-            "by", "from", "as", "is", "was", "are", "been", "be", "have",
-            "has", "had", "do", "does", "did", "will", "would", "could",
-            "should", "may", "might", "must", "can", "wearing", "holding"
-        }
-        
-        # Split and clean words
-        words = re.findall(r'\b\w+\b', text.lower())
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_keywords = []
-    for keyword in keywords:
-        if keyword not in seen:
-            seen.add(keyword)
-            unique_keywords.append(keyword)
-    
-    return unique_keywords[:10]  # Limit to top 10 keywords
+        loop = asyncio.get_running_loop()
+        batcher = _batchers.get(loop)
+        if batcher is None:
+            batcher = _batchers[loop] = MicroBatcher()
+        candidates, source = await batcher.submit(text)
+
+    await keyword_memo.set(_memo_key(text, source), {"candidates": candidates, "source": source})
+    return candidates, source
+
+
+async def extract_scored_keywords_async(
+    text: str,
+    fast: bool = False,
+    top_k: Optional[int] = None
+) -> Tuple[List[Tuple[str, float]], str]:
+    """extract_scored_keywords() for async callers"""
+    candidates, source = await _candidates_async(text, fast)
+    if keyword_ranking.needs_refresh():
+        await asyncio.to_thread(keyword_ranking.get_corpus)
+    return keyword_ranking.rank(candidates, top_k or settings.KEYWORD_TOP_K), source
+
+
+async def extract_keywords_async(text: str, fast: bool = False, top_k: Optional[int] = None) -> List[str]:
+    """extract_keywords() for async callers"""
+    return [keyword for keyword, _ in (await extract_scored_keywords_async(text, fast, top_k))[0]]
+
+
+def stats() -> Dict[str, Any]:
+    batchers = list(_batchers.values())
+    return {
+        "nlp": "spacy" if _nlp is not None else ("regex" if _nlp_failed else "not_loaded"),
+        "memo": keyword_memo.stats(),
+        "microbatches": sum(batcher.batches for batcher in batchers),
+        "microbatched_texts": sum(batcher.texts for batcher in batchers),
+    }
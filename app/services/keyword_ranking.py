@@ -0,0 +1,136 @@
+"""
+TF-IDF ranking of extracted keyword candidates.
+
+Document frequencies come from the keyword_frequencies table, built from the
+initial prompts of stored sessions:
+
+    python -m app.services.keyword_ranking   (after python -m app.core.migrations)
+
+Terms that repeat in a prompt but are rare across the corpus rank first; words
+nearly every prompt uses sink. Until the table is built every term gets the
+same IDF, so ranking falls back to term frequency and position.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session as OrmSession
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import models
+
+logger = logging.getLogger(__name__)
+
+_TERM = re.compile(r"\w{3,}")
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased word terms, as counted in the corpus table"""
+    return _TERM.findall(text.lower())
+
+
+class CorpusFrequencies:
+    """Document count plus per-term document frequencies"""
+
+    def __init__(self, documents: int = 0, frequencies: Optional[Dict[str, int]] = None):
+        self.documents = documents
+        self.frequencies = frequencies or {}
+
+    def idf(self, term: str) -> float:
+        # Smoothed, so unseen terms score highest and no term scores zero
+        document_count = self.frequencies.get(term, 0)
+        return math.log((1 + self.documents) / (1 + document_count)) + 1
+
+    def phrase_idf(self, phrase: str) -> float:
+        """Mean IDF of a (possibly multi-word) candidate's terms"""
+        phrase_terms = terms(phrase) or [phrase.lower()]
+        return sum(self.idf(term) for term in phrase_terms) / len(phrase_terms)
+
+
+_corpus = CorpusFrequencies()
+_loaded_at: Optional[float] = None
+_load_lock = threading.Lock()
+
+
+def needs_refresh() -> bool:
+    return _loaded_at is None or time.monotonic() - _loaded_at > settings.KEYWORD_CORPUS_REFRESH
+
+
+def load_corpus(db: OrmSession) -> CorpusFrequencies:
+    rows = db.execute(select(models.KeywordFrequency.term, models.KeywordFrequency.document_count)).all()
+    frequencies = dict(rows)
+    documents = frequencies.pop(models.KeywordFrequency.CORPUS_SIZE_TERM, 0)
+    return CorpusFrequencies(documents, frequencies)
+
+
+def get_corpus() -> CorpusFrequencies:
+    """The cached corpus table, reloaded every KEYWORD_CORPUS_REFRESH seconds"""
+    global _corpus, _loaded_at
+    if not needs_refresh():
+        return _corpus
+    with _load_lock:
+        if needs_refresh():
+            try:
+                with SessionLocal() as db:
+                    _corpus = load_corpus(db)
+            except Exception as e:
+                # Rank with what we have rather than fail extraction
+                logger.warning(f"Could not load keyword corpus: {str(e)}")
+            _loaded_at = time.monotonic()
+    return _corpus
+
+
+def rank(candidates: List[str], top_k: int, corpus: Optional[CorpusFrequencies] = None) -> List[Tuple[str, float]]:
+    """
+    Score candidates (in document order, repeats included) by
+    tf * idf * position weight and return the best `top_k` as (keyword, score).
+    """
+    corpus = corpus or get_corpus()
+    counts = Counter(candidates)
+    first_position: Dict[str, int] = {}
+    for position, candidate in enumerate(candidates):
+        first_position.setdefault(candidate, position)
+
+    scored = []
+    for candidate, position in first_position.items():
+        # Earlier mentions are usually the subject of the prompt
+        position_weight = 1.0 / (1.0 + 0.1 * position)
+        score = counts[candidate] * corpus.phrase_idf(candidate) * position_weight
+        scored.append((candidate, round(score, 4), position))
+
+    scored.sort(key=lambda item: (-item[1], item[2]))
+    return [(candidate, score) for candidate, score, _ in scored[:top_k]]
+
+
+def build_corpus(db: OrmSession) -> int:
+    """Recount term document frequencies over all session prompts; returns the prompt count"""
+    counts: Counter = Counter()
+    documents = 0
+    prompts = db.execute(select(models.Session.initial_prompt).execution_options(yield_per=1000))
+    for (prompt,) in prompts:
+        if prompt:
+            documents += 1
+            counts.update(set(terms(prompt)))
+
+    rows = [{"term": models.KeywordFrequency.CORPUS_SIZE_TERM, "document_count": documents}]
+    rows.extend(
+        {"term": term, "document_count": document_count}
+        for term, document_count in counts.most_common(settings.KEYWORD_CORPUS_MAX_TERMS)
+    )
+    db.execute(delete(models.KeywordFrequency))
+    db.execute(insert(models.KeywordFrequency), rows)
+    db.commit()
+    return documents
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        count = build_corpus(db)
+    logger.info(f"Built keyword corpus from {count} session prompts")
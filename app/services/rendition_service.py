@@ -0,0 +1,129 @@
+"""
+Rendition engine for generated images.
+
+A single decode of the source image produces every configured derivative
+(gallery thumbnail, feed preview, Meta-ready 1080x1080 JPEG, ...). Resizing and
+encoding are CPU-bound and hold the GIL, so they run in a process pool rather
+than on the API worker.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ImageOps, features
+
+from app.core.config import settings
+
+FORMAT_EXTENSIONS = {
+    "webp": "webp",
+    "avif": "avif",
+    "jpeg": "jpg",
+    "png": "png",
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if _executor is None and settings.RENDITION_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=settings.RENDITION_WORKERS)
+    return _executor
+
+
+def shutdown() -> None:
+    """Stop the rendition worker processes"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _resolve_format(fmt: str) -> str:
+    fmt = fmt.lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    # AVIF needs Pillow >= 11.3 (or pillow-avif-plugin); fall back to WebP otherwise
+    if fmt == "avif" and not features.check("avif"):
+        fmt = "webp"
+    return fmt
+
+
+def extract_dominant_colors(image: Image.Image, count: int = 5) -> List[str]:
+    """Return the `count` most common colours of an (already small) image as hex strings"""
+    palette_image = image.convert("RGB").quantize(colors=count)
+    palette = palette_image.getpalette() or []
+    colors = sorted(palette_image.getcolors() or [], reverse=True)
+    return [
+        "#{:02x}{:02x}{:02x}".format(*palette[index * 3:index * 3 + 3])
+        for _, index in colors[:count]
+    ]
+
+
+def _render(source: Image.Image, spec: Dict[str, Any], fmt: str) -> Image.Image:
+    size = (spec["width"], spec["height"])
+    if spec.get("fit", "contain") == "cover":
+        # Exact output size, centre-cropped (what ad placements expect)
+        image = ImageOps.fit(source, size, Image.Resampling.LANCZOS)
+    else:
+        image = source.copy()
+        image.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def render_renditions(source_path: str, output_dir: str, stem: str,
+                      specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Decode `source_path` once and write every rendition in `specs` to
+    `output_dir` as `<stem>_<name>.<ext>`. Runs inside a worker process.
+    """
+    files: Dict[str, str] = {}
+    with Image.open(source_path) as image:
+        width, height = image.size
+        largest = max((max(spec["width"], spec["height"]) for spec in specs), default=0)
+        # JPEG sources can be decoded at reduced scale; a no-op for PNG
+        image.draft("RGB", (largest, largest))
+        image.load()
+
+        smallest: Optional[Image.Image] = None
+        for spec in specs:
+            fmt = _resolve_format(spec.get("format", "webp"))
+            rendition = _render(image, spec, fmt)
+            filename = f"{stem}_{spec['name']}.{FORMAT_EXTENSIONS[fmt]}"
+
+            save_kwargs: Dict[str, Any] = {"quality": spec.get("quality", 85)}
+            if fmt == "jpeg":
+                save_kwargs.update(optimize=True, progressive=True)
+            elif fmt == "webp":
+                save_kwargs["method"] = 4
+            elif fmt == "png":
+                save_kwargs = {"optimize": True}
+            rendition.save(os.path.join(output_dir, filename), format=fmt.upper(), **save_kwargs)
+            files[spec["name"]] = filename
+
+            if smallest is None or rendition.width * rendition.height < smallest.width * smallest.height:
+                smallest = rendition
+
+        # Colour analysis reuses the smallest rendition instead of decoding again
+        dominant_colors = extract_dominant_colors(smallest or image)
+
+    return {
+        "width": width,
+        "height": height,
+        "files": files,
+        "dominant_colors": dominant_colors
+    }
+
+
+async def create_renditions_async(source_path: str, output_dir: str, stem: str,
+                                  specs: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Render all configured sizes/formats for an image off the event loop"""
+    specs = specs if specs is not None else settings.IMAGE_RENDITIONS
+    loop = asyncio.get_running_loop()
+    # RENDITION_WORKERS=0 renders in the default thread pool instead (e.g. for local dev)
+    return await loop.run_in_executor(
+        _get_executor(), render_renditions, source_path, output_dir, stem, specs
+    )
@@ -1,17 +1,27 @@
-import httpx
 import asyncio
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import hashlib
 import json
 from app.core.config import settings
+from app.core import singleflight
+from app.core.tiered_cache import TieredCache, build_backend
 from app.schemas.advertising_schemas import ResearchSummary, TrendingTheme
+from app.services import web_scraper
 import random
-from bs4 import BeautifulSoup
 import openai
 
-# Mock cache for development (no Redis required)
-MOCK_CACHE = {}
+# Bounded in-process LRU in front of the shared tier (trend_cache table by default, no Redis required)
+research_cache = TieredCache(
+    "research",
+    backend=build_backend(settings.RESEARCH_CACHE_BACKEND, settings.REDIS_URL, "research"),
+    maxsize=settings.RESEARCH_CACHE_MAX_ENTRIES,
+    ttl=settings.RESEARCH_CACHE_TTL,
+    local_ttl=settings.RESEARCH_CACHE_LOCAL_TTL,
+)
+
+# Concurrent scrapes of the same URL share one fetch
+scrape_flight = singleflight.group("scrape")
 
 # Initialize OpenAI client for analysis
 if settings.OPENAI_API_KEY:
@@ -20,29 +30,7 @@ if settings.OPENAI_API_KEY:
 
 async def scrape_website_data(website_url: str) -> Dict[str, Any]:
     """Scrape company website for insights"""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(website_url, timeout=10.0)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract basic information
-            title = soup.find('title')
-            meta_description = soup.find('meta', attrs={'name': 'description'})
-            
-            # Extract text content (limit to avoid too much data)
-            text_content = soup.get_text()[:2000]
-            
-            return {
-                "title": title.text if title else "",
-                "description": meta_description.get('content') if meta_description else "",
-                "content_sample": text_content,
-                "scraped_at": datetime.utcnow().isoformat()
-            }
-    except Exception as e:
-        return {
-            "error": f"Failed to scrape website: {str(e)}",
-            "scraped_at": datetime.utcnow().isoformat()
-        }
+    return await scrape_flight.do(website_url, lambda: web_scraper.scrape(website_url))
 
 
 async def analyze_market_trends(product_info: Dict[str, Any]) -> Dict[str, Any]:
@@ -121,36 +109,41 @@ async def conduct_comprehensive_research(
 ) -> Dict[str, Any]:
     """Conduct comprehensive research combining multiple sources"""
     
-    # Cache key for research data
+    # Only the product research is cached here. Website data is left out of the
+    # entry and fetched through the scraper's own per-URL cache on every call, so
+    # its revalidation (SCRAPE_CACHE_MAX_AGE) decides how fresh it is
     cache_key = f"research:{hashlib.md5(json.dumps(product_info, sort_keys=True).encode()).hexdigest()}"
     
-    # Check mock cache first
-    if cache_key in MOCK_CACHE:
-        return MOCK_CACHE[cache_key]
-    
-    # Conduct research from multiple sources
-    tasks = [
-        analyze_market_trends(product_info),
-        analyze_competitor_landscape(product_info)
-    ]
-    
+    # Concurrent identical requests share one computation
+    tasks = [research_cache.get_or_compute(cache_key, lambda: _run_research(product_info))]
     if website_url:
         tasks.append(scrape_website_data(website_url))
     
     results = await asyncio.gather(*tasks, return_exceptions=True)
+    if isinstance(results[0], Exception):
+        raise results[0]
+    
+    research_data = results[0]
+    research_data["website_data"] = results[1] if len(results) > 1 and not isinstance(results[1], Exception) else {}
+    return research_data
+
+
+async def _run_research(product_info: Dict[str, Any]) -> Dict[str, Any]:
+    # Conduct research from multiple sources
+    results = await asyncio.gather(
+        analyze_market_trends(product_info),
+        analyze_competitor_landscape(product_info),
+        return_exceptions=True
+    )
     
     # Combine results
     research_data = {
         "market_trends": results[0] if not isinstance(results[0], Exception) else {},
         "competitor_analysis": results[1] if not isinstance(results[1], Exception) else {},
-        "website_data": results[2] if len(results) > 2 and not isinstance(results[2], Exception) else {},
         "research_timestamp": datetime.utcnow().isoformat(),
         "product_info": product_info
     }
     
-    # Cache results in mock cache
-    MOCK_CACHE[cache_key] = research_data
-    
     return research_data
 
 
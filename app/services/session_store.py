@@ -0,0 +1,121 @@
+"""
+Reads and writes for the normalized per-session data: product info, research
+sections, ad ideas, chat state and chat messages.
+
+Callers fetch only the parts they need (e.g. one research section) and writes
+touch only the rows that changed, instead of re-serializing whole JSON blobs
+on the sessions table.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+
+
+async def save_product_info(db: AsyncSession, session_id: str, product_info: Dict[str, Any]) -> None:
+    row = await db.get(models.ProductInfo, session_id)
+    if row is None:
+        db.add(models.ProductInfo.from_dict(session_id, product_info))
+    else:
+        row.update_from(product_info)
+
+
+async def get_product_info(db: AsyncSession, session_id: str) -> Dict[str, Any]:
+    row = await db.get(models.ProductInfo, session_id)
+    return row.to_dict() if row else {}
+
+
+async def save_research(db: AsyncSession, session_id: str, research_data: Dict[str, Any]) -> None:
+    """Replace a session's research, one row per top-level section"""
+    await db.execute(delete(models.ResearchResult).where(models.ResearchResult.session_id == session_id))
+    db.add_all(
+        models.ResearchResult(session_id=session_id, section=section, data=data)
+        for section, data in research_data.items()
+    )
+
+
+async def get_research(
+    db: AsyncSession,
+    session_id: str,
+    sections: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
+    """Research data for a session, limited to `sections` when given"""
+    query = (
+        select(models.ResearchResult.section, models.ResearchResult.data)
+        .where(models.ResearchResult.session_id == session_id)
+    )
+    if sections is not None:
+        query = query.where(models.ResearchResult.section.in_(sections))
+    rows = await db.execute(query)
+    return {section: data for section, data in rows.all()}
+
+
+async def save_ideas(db: AsyncSession, session_id: str, ideas: List[Dict[str, Any]]) -> None:
+    """Replace the ideas offered for a session"""
+    await db.execute(delete(models.AdIdea).where(models.AdIdea.session_id == session_id))
+    db.add_all(models.AdIdea.from_dict(session_id, position, idea) for position, idea in enumerate(ideas))
+
+
+async def get_ideas(
+    db: AsyncSession,
+    session_id: str,
+    idea_ids: Optional[Sequence[str]] = None
+) -> List[Dict[str, Any]]:
+    """A session's ideas in the order they were offered, limited to `idea_ids` when given"""
+    query = select(models.AdIdea).where(models.AdIdea.session_id == session_id)
+    if idea_ids is not None:
+        query = query.where(models.AdIdea.idea_id.in_(idea_ids))
+    rows = await db.scalars(query.order_by(models.AdIdea.position))
+    return [idea.to_dict() for idea in rows]
+
+
+async def get_chat_state(db: AsyncSession, session_id: str) -> Optional[models.ChatState]:
+    return await db.get(models.ChatState, session_id)
+
+
+async def append_messages(
+    db: AsyncSession,
+    session_id: str,
+    messages: Iterable[Tuple[str, str]]
+) -> List[models.ChatMessage]:
+    """Append (role, content) pairs to the session's chat log"""
+    last_sequence = await db.scalar(
+        select(func.max(models.ChatMessage.sequence)).where(models.ChatMessage.session_id == session_id)
+    )
+    rows = [
+        models.ChatMessage(session_id=session_id, sequence=sequence, role=role, content=content)
+        for sequence, (role, content) in enumerate(messages, start=(last_sequence or 0) + 1)
+    ]
+    db.add_all(rows)
+    return rows
+
+
+async def get_messages(
+    db: AsyncSession,
+    session_id: str,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[models.ChatMessage]:
+    """
+    A window of the session's chat log in sequence order.
+    `after` pages forward from a cursor; otherwise `limit` takes the newest
+    messages (before `before`, when given) for scrolling back.
+    """
+    query = select(models.ChatMessage).where(models.ChatMessage.session_id == session_id)
+    if after is not None:
+        query = query.where(models.ChatMessage.sequence > after)
+    if before is not None:
+        query = query.where(models.ChatMessage.sequence < before)
+    
+    if after is None and limit is not None:
+        rows = list(await db.scalars(query.order_by(models.ChatMessage.sequence.desc()).limit(limit)))
+        rows.reverse()
+        return rows
+    
+    query = query.order_by(models.ChatMessage.sequence)
+    if limit is not None:
+        query = query.limit(limit)
+    return list(await db.scalars(query))
@@ -0,0 +1,228 @@
+"""
+Content-addressed image storage.
+
+Objects are keyed by the SHA-256 of their bytes (`ab/abcdef....png`), so
+identical images produced by edits or regenerated variations are stored once.
+Writes are atomic: local files are renamed into place, S3 puts are atomic by
+design. The backend is chosen with STORAGE_BACKEND ("local" or "s3"); the S3
+backend works with any S3-compatible endpoint such as MinIO.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_LOCAL_ROOT = os.path.join(PROJECT_ROOT, "static", "generated")
+# Outside static/, which is served as is, but on the same filesystem as the default root
+DEFAULT_LOCAL_STAGING = os.path.join(PROJECT_ROOT, ".storage-staging")
+
+
+@dataclass
+class StoredObject:
+    key: str
+    url: str
+    digest: str
+    size: int
+    deduplicated: bool = False
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_key(digest: str, ext: str) -> str:
+    # Two-character fan-out keeps directories small on local disks
+    return f"{digest[:2]}/{digest}.{ext.lstrip('.').lower()}"
+
+
+class StorageBackend(ABC):
+    """Interface shared by the storage backends"""
+
+    @abstractmethod
+    def staging_dir(self) -> str:
+        """Directory for in-progress files; same filesystem as the store when possible"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def put_file(self, path: str, key: str, content_type: str) -> None:
+        """Atomically store the file at `path` under `key`, consuming `path`"""
+
+    @abstractmethod
+    def url_for(self, key: str) -> str:
+        ...
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """Return a local filesystem path for `key`, fetching it first if needed"""
+
+
+class LocalStorageBackend(StorageBackend):
+    def __init__(self, root: str, url_prefix: str = "/static/generated", staging: str = DEFAULT_LOCAL_STAGING):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        # Never under `root`: everything there is publicly reachable by URL
+        self._staging = staging
+        os.makedirs(self._staging, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def staging_dir(self) -> str:
+        return self._staging
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put_file(self, path: str, key: str, content_type: str) -> None:
+        dest = self._path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            # Rename is atomic on the same filesystem: readers never see a partial file
+            os.replace(path, dest)
+        except OSError:
+            tmp_dest = f"{dest}.{uuid.uuid4().hex}.tmp"
+            shutil.copyfile(path, tmp_dest)
+            os.replace(tmp_dest, dest)
+            os.remove(path)
+
+    def url_for(self, key: str) -> str:
+        base = settings.STORAGE_PUBLIC_BASE_URL or self.url_prefix
+        return f"{base.rstrip('/')}/{key}"
+
+    def local_path(self, key: str) -> str:
+        return self._path(key)
+
+
+class S3StorageBackend(StorageBackend):
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None):
+        import boto3
+
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        )
+        self._staging = os.path.join(tempfile.gettempdir(), "ad-intel-staging")
+        os.makedirs(self._staging, exist_ok=True)
+
+    def staging_dir(self) -> str:
+        return self._staging
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, path: str, key: str, content_type: str) -> None:
+        self.client.upload_file(
+            path, self.bucket, key,
+            ExtraArgs={
+                "ContentType": content_type,
+                # Content-addressed objects never change
+                "CacheControl": "public, max-age=31536000, immutable",
+            },
+        )
+        os.remove(path)
+
+    def url_for(self, key: str) -> str:
+        if settings.STORAGE_PUBLIC_BASE_URL:
+            return f"{settings.STORAGE_PUBLIC_BASE_URL.rstrip('/')}/{key}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+    def local_path(self, key: str) -> str:
+        cache_path = os.path.join(self._staging, "cache", *key.split("/"))
+        if not os.path.exists(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+            self.client.download_file(self.bucket, key, tmp_path)
+            os.replace(tmp_path, cache_path)
+        return cache_path
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def local_root() -> str:
+    """Directory the local backend stores into; main.py serves it at STORAGE_LOCAL_URL_PREFIX"""
+    return settings.STORAGE_LOCAL_ROOT or DEFAULT_LOCAL_ROOT
+
+
+def get_storage() -> StorageBackend:
+    """Return the configured storage backend (created on first use)"""
+    global _backend
+    if _backend is None:
+        if settings.STORAGE_BACKEND == "s3":
+            _backend = S3StorageBackend(
+                bucket=settings.AWS_BUCKET_NAME,
+                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                region=settings.AWS_REGION,
+            )
+        elif settings.STORAGE_BACKEND == "local":
+            _backend = LocalStorageBackend(
+                local_root(),
+                url_prefix=settings.STORAGE_LOCAL_URL_PREFIX,
+                staging=settings.STORAGE_LOCAL_STAGING_DIR or DEFAULT_LOCAL_STAGING,
+            )
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return _backend
+
+
+def staging_path(ext: str) -> str:
+    """A fresh path in the backend's staging area for a file that will be stored later"""
+    return os.path.join(get_storage().staging_dir(), f"{uuid.uuid4().hex}.{ext.lstrip('.')}")
+
+
+def store_file(path: str, ext: str, digest: Optional[str] = None) -> StoredObject:
+    """
+    Move the file at `path` into the content-addressed store.
+    If identical bytes are already stored, the new file is discarded instead.
+    """
+    backend = get_storage()
+    digest = digest or hash_file(path)
+    size = os.path.getsize(path)
+    key = content_key(digest, ext)
+
+    if backend.exists(key):
+        os.remove(path)
+        return StoredObject(key=key, url=backend.url_for(key), digest=digest, size=size, deduplicated=True)
+
+    backend.put_file(path, key, CONTENT_TYPES.get(ext.lstrip(".").lower(), "application/octet-stream"))
+    return StoredObject(key=key, url=backend.url_for(key), digest=digest, size=size)
+
@@ -1,16 +1,36 @@
-import httpx
 import asyncio
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+import logging
+from typing import Awaitable, Callable, List, Dict, Any, Optional
+from datetime import datetime
 import hashlib
-import json
+from app.core import json_codec, singleflight
 from app.core.config import settings
+from app.core.redis_cache import CircuitBreaker, FallbackRedisCache
 from app.schemas.schemas import ClarifyingQuestion, QuestionOption
-import redis
 import random
 
-# Initialize Redis client for caching
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+logger = logging.getLogger(__name__)
+
+# Redis-backed trend cache; the client is created on first use and lookups
+# fall back to an in-process TTL cache while Redis is unreachable
+trend_cache = FallbackRedisCache(
+    "trends",
+    settings.REDIS_URL,
+    local_maxsize=settings.TREND_LOCAL_CACHE_MAX_ENTRIES,
+    local_ttl=settings.CACHE_TTL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.REDIS_BREAKER_FAILURES,
+        reset_timeout=settings.REDIS_BREAKER_RESET_TIMEOUT
+    )
+)
+
+# Concurrent misses for the same source and keywords share one source call
+trend_flight = singleflight.group("trends")
+
+_counters = {"keyword_hits": 0, "keyword_misses": 0}
 
 
 async def fetch_google_trends(keywords: List[str]) -> Dict[str, Any]:
@@ -58,45 +78,91 @@ async def fetch_social_media_trends(keywords: List[str]) -> Dict[str, Any]:
     return social_trends
 
 
-def fetch_trend_data(keywords: List[str]) -> Dict[str, Any]:
+async def _fetch_source(name: str, call: Awaitable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Await one trend source within TREND_SOURCE_TIMEOUT; a slow or failing source yields None"""
+    try:
+        return await asyncio.wait_for(call, timeout=settings.TREND_SOURCE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Trend source {name} timed out after {settings.TREND_SOURCE_TIMEOUT}s")
+    except Exception as e:
+        logger.warning(f"Trend source {name} failed: {str(e)}")
+    return None
+
+
+# Trend sources, by the key they appear under in trend data
+TREND_SOURCES: Dict[str, Callable[[List[str]], Awaitable[Dict[str, Any]]]] = {
+    "google_trends": fetch_google_trends,
+    "social_media": fetch_social_media_trends,
+}
+
+
+def _keyword_cache_key(source: str, keyword: str) -> str:
+    return f"trends:{source}:{keyword}"
+
+
+async def _fetch_missing(source: str, keywords: List[str]) -> Optional[Dict[str, Any]]:
+    """Call one source for the keywords not in the cache and cache each keyword's entry"""
+    data = await _fetch_source(source, TREND_SOURCES[source](keywords))
+    if data is None:
+        # Nothing is cached, so a timed-out source is retried next time
+        return None
+    await trend_cache.mset(
+        {
+            _keyword_cache_key(source, keyword): json_codec.dumps(data[keyword])
+            for keyword in keywords
+            if keyword in data
+        },
+        settings.CACHE_TTL
+    )
+    return data
+
+
+async def fetch_trend_data(keywords: List[str]) -> Dict[str, Any]:
     """
     Fetch trend data from multiple sources with caching.
+    Entries are cached per source and keyword, so the result is assembled
+    from hits and only missing keywords are fetched.
     """
-    # Create cache key from keywords
-    cache_key = f"trends:{hashlib.md5(':'.join(sorted(keywords)).encode()).hexdigest()}"
-    
-    # Check cache first
-    cached_data = redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data)
-    
-    # Fetch from multiple sources asynchronously
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    keywords = list(dict.fromkeys(keywords))
+    pairs = [(source, keyword) for source in TREND_SOURCES for keyword in keywords]
     
-    google_trends_task = loop.create_task(fetch_google_trends(keywords))
-    social_trends_task = loop.create_task(fetch_social_media_trends(keywords))
+    # One MGET for every (source, keyword) entry
+    cached = await trend_cache.mget([_keyword_cache_key(source, keyword) for source, keyword in pairs])
     
-    google_trends = loop.run_until_complete(google_trends_task)
-    social_trends = loop.run_until_complete(social_trends_task)
+    trend_data: Dict[str, Any] = {source: {} for source in TREND_SOURCES}
+    missing: Dict[str, List[str]] = {}
+    for (source, keyword), value in zip(pairs, cached):
+        if value is not None:
+            trend_data[source][keyword] = json_codec.loads(value)
+        else:
+            missing.setdefault(source, []).append(keyword)
+    _counters["keyword_hits"] += len(pairs) - sum(len(words) for words in missing.values())
+    _counters["keyword_misses"] += sum(len(words) for words in missing.values())
     
-    # Combine trend data
-    trend_data = {
-        "google_trends": google_trends,
-        "social_media": social_trends,
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    
-    # Cache the results
-    redis_client.setex(
-        cache_key,
-        settings.CACHE_TTL,
-        json.dumps(trend_data)
-    )
+    if missing:
+        # Sources run concurrently, each with its own timeout; concurrent misses for
+        # the same source and keywords share one call
+        sources = list(missing)
+        results = await asyncio.gather(*(
+            trend_flight.do(
+                f"{source}:{hashlib.md5(':'.join(sorted(missing[source])).encode()).hexdigest()}",
+                lambda source=source: _fetch_missing(source, missing[source])
+            )
+            for source in sources
+        ))
+        for source, data in zip(sources, results):
+            for keyword in missing[source]:
+                if data and keyword in data:
+                    trend_data[source][keyword] = data[keyword]
     
+    trend_data["timestamp"] = datetime.utcnow().isoformat()
     return trend_data
 
 
+def stats() -> Dict[str, Any]:
+    return {**_counters, **trend_cache.stats()}
+
+
 def generate_clarifying_questions(trend_data: Dict[str, Any]) -> List[ClarifyingQuestion]:
     """
     Generate clarifying questions based on trend data.
@@ -0,0 +1,331 @@
+"""
+Website scraper for the research step.
+
+Pages are fetched with the shared pooled client from app.core.http_client and
+streamed with a byte cap, so a huge landing page is cut off instead of being
+buffered whole. robots.txt is honoured per origin, and each domain gets a small
+number of concurrent fetches. HTML parsing (selectolax, else lxml, else
+BeautifulSoup) runs in a thread pool so it never blocks the event loop.
+
+Extracted fields are cached per URL together with the page's ETag and
+Last-Modified validators. Within SCRAPE_CACHE_MAX_AGE the cached fields are
+served as is; after that the page is revalidated with a conditional request,
+so an unchanged site costs a 304 and no parse.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import re
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from app.core import http_client, singleflight
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.tiered_cache import TieredCache, build_backend
+
+if importlib.util.find_spec("selectolax") is not None:
+    PARSER = "selectolax"
+elif importlib.util.find_spec("lxml") is not None:
+    PARSER = "lxml"
+else:
+    PARSER = "html.parser"
+
+# Elements whose text never reads as page copy
+NON_CONTENT_TAGS = ["script", "style", "noscript", "template", "svg"]
+
+ROBOTS_MAX_BYTES = 512 * 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# origin -> parsed robots.txt (None when every path is allowed)
+_robots = TTLCache(maxsize=1024, ttl=settings.SCRAPE_ROBOTS_TTL)
+robots_flight = singleflight.group("robots")
+
+# Per event loop: host -> [semaphore, active users]
+_domain_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, list]]" = weakref.WeakKeyDictionary()
+
+# url -> {"data", "etag", "last_modified", "digest", "checked_at"}
+page_cache = TieredCache(
+    "scrape_pages",
+    backend=build_backend(settings.RESEARCH_CACHE_BACKEND, settings.REDIS_URL, "scrape_pages"),
+    maxsize=settings.SCRAPE_CACHE_MAX_ENTRIES,
+    ttl=settings.SCRAPE_CACHE_TTL,
+    local_ttl=settings.RESEARCH_CACHE_LOCAL_TTL,
+)
+
+_counters = {
+    "fetched": 0, "truncated": 0, "blocked_by_robots": 0, "errors": 0,
+    "fresh_hits": 0, "not_modified": 0, "unchanged_body": 0, "stale_served": 0,
+}
+
+
+class ScrapeError(Exception):
+    """The page could not be fetched or is not HTML"""
+
+
+class BlockedByRobots(ScrapeError):
+    """robots.txt disallows fetching the page"""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.SCRAPE_PARSE_WORKERS, thread_name_prefix="html-parse")
+    return _executor
+
+
+def shutdown() -> None:
+    """Stop the parser threads"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _clean_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()[:settings.SCRAPE_TEXT_LIMIT]
+
+
+def _parse_selectolax(body: bytes) -> Tuple[str, str, str]:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(body)
+    title = tree.css_first("title")
+    meta = tree.css_first('meta[name="description"]')
+    tree.strip_tags(NON_CONTENT_TAGS)
+    root = tree.body or tree.root
+    return (
+        title.text() if title else "",
+        (meta.attributes.get("content") or "") if meta else "",
+        root.text(separator=" ") if root else "",
+    )
+
+
+def _parse_lxml(body: bytes) -> Tuple[str, str, str]:
+    import lxml.html
+    from lxml import etree
+
+    document = lxml.html.document_fromstring(body)
+    title = document.findtext(".//title") or ""
+    description = document.xpath('//meta[@name="description"]/@content')
+    etree.strip_elements(document, *NON_CONTENT_TAGS, with_tail=False)
+    root = document.find("body")
+    return (
+        title,
+        description[0] if description else "",
+        (root if root is not None else document).text_content(),
+    )
+
+
+def _parse_soup(body: bytes) -> Tuple[str, str, str]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body, "html.parser")
+    title = soup.find("title")
+    meta = soup.find("meta", attrs={"name": "description"})
+    for element in soup(NON_CONTENT_TAGS):
+        element.decompose()
+    return (
+        title.get_text() if title else "",
+        meta.get("content", "") if meta else "",
+        soup.get_text(" "),
+    )
+
+
+_PARSERS = {"selectolax": _parse_selectolax, "lxml": _parse_lxml, "html.parser": _parse_soup}
+
+
+def parse_html(body: bytes) -> Dict[str, str]:
+    """Title, meta description and a whitespace-collapsed text sample of `body`"""
+    title, description, text = _PARSERS[PARSER](body)
+    return {
+        "title": title.strip(),
+        "description": description.strip(),
+        "content_sample": _clean_text(text),
+    }
+
+
+async def parse_html_async(body: bytes) -> Dict[str, str]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), parse_html, body)
+
+
+@asynccontextmanager
+async def _domain_slot(host: str) -> AsyncIterator[None]:
+    """Cap concurrent fetches against one host (SCRAPE_PER_DOMAIN_CONCURRENCY)"""
+    slots = _domain_slots.setdefault(asyncio.get_running_loop(), {})
+    slot = slots.get(host)
+    if slot is None:
+        slot = slots[host] = [asyncio.Semaphore(settings.SCRAPE_PER_DOMAIN_CONCURRENCY), 0]
+    slot[1] += 1
+    try:
+        async with slot[0]:
+            yield
+    finally:
+        slot[1] -= 1
+        if not slot[1]:
+            slots.pop(host, None)
+
+
+async def _read_capped(response: httpx.Response, max_bytes: int) -> Tuple[bytes, bool]:
+    """Read at most `max_bytes` of the body; report whether it was cut off"""
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            return b"".join(chunks)[:max_bytes], True
+    return b"".join(chunks), False
+
+
+async def _fetch_robots(origin: str) -> Optional[str]:
+    """robots.txt for `origin`, or None when it imposes no rules"""
+    client = http_client.get_http_client()
+    try:
+        async with client.stream(
+            "GET", f"{origin}/robots.txt",
+            headers={"User-Agent": settings.SCRAPE_USER_AGENT},
+            timeout=settings.SCRAPE_TIMEOUT
+        ) as response:
+            if response.status_code in (401, 403):
+                return "User-agent: *\nDisallow: /"
+            if response.status_code >= 400:
+                return None
+            body, _ = await _read_capped(response, ROBOTS_MAX_BYTES)
+    except httpx.HTTPError:
+        # Unreachable robots.txt: let the page fetch itself succeed or fail
+        return None
+    return body.decode("utf-8", errors="replace")
+
+
+async def _robots_parser(origin: str) -> Optional[RobotFileParser]:
+    cached = _robots.get(origin, False)
+    if cached is not False:
+        return cached
+
+    text = await robots_flight.do(origin, lambda: _fetch_robots(origin))
+    parser = None
+    if text:
+        parser = RobotFileParser()
+        parser.parse(text.splitlines())
+    _robots.set(origin, parser)
+    return parser
+
+
+async def is_allowed(url: str) -> bool:
+    """Whether robots.txt lets SCRAPE_USER_AGENT fetch `url`"""
+    if not settings.SCRAPE_RESPECT_ROBOTS:
+        return True
+    parts = urlsplit(url)
+    parser = await _robots_parser(f"{parts.scheme}://{parts.netloc}")
+    return parser is None or parser.can_fetch(settings.SCRAPE_USER_AGENT, url)
+
+
+async def _fetch(url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[httpx.Response, bytes, bool]:
+    request_headers = {"User-Agent": settings.SCRAPE_USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+    request_headers.update(headers or {})
+    async with http_client.get_http_client().stream(
+        "GET", url, headers=request_headers, timeout=settings.SCRAPE_TIMEOUT
+    ) as response:
+        if response.status_code == 304:
+            return response, b"", False
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "text/html")
+        if "html" not in content_type and "xml" not in content_type:
+            raise ScrapeError(f"Unsupported content type: {content_type}")
+        body, truncated = await _read_capped(response, settings.SCRAPE_MAX_BYTES)
+        return response, body, truncated
+
+
+async def fetch_page(url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[httpx.Response, bytes]:
+    """
+    Fetch `url` under its domain's concurrency limit after checking robots.txt.
+    The body is capped at SCRAPE_MAX_BYTES and the whole fetch at SCRAPE_TIMEOUT.
+    Raises ScrapeError (BlockedByRobots) or httpx errors.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise ScrapeError(f"Not an http(s) URL: {url}")
+
+    async with _domain_slot(parts.netloc.lower()):
+        if not await is_allowed(url):
+            _counters["blocked_by_robots"] += 1
+            raise BlockedByRobots(f"robots.txt disallows {url}")
+        response, body, truncated = await asyncio.wait_for(_fetch(url, headers), settings.SCRAPE_TIMEOUT)
+
+    _counters["fetched"] += 1
+    if truncated:
+        _counters["truncated"] += 1
+    return response, body
+
+
+def _cache_key(url: str) -> str:
+    return f"scrape:{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+def _conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+async def scrape(url: str) -> Dict[str, Any]:
+    """Title, description and a text sample for `url`, cached and revalidated per URL"""
+    key = _cache_key(url)
+    entry = await page_cache.get(key)
+    if entry and time.time() - entry["checked_at"] < settings.SCRAPE_CACHE_MAX_AGE:
+        _counters["fresh_hits"] += 1
+        return entry["data"]
+
+    try:
+        response, body = await fetch_page(url, _conditional_headers(entry))
+        if entry and response.status_code == 304:
+            _counters["not_modified"] += 1
+            data, digest = entry["data"], entry["digest"]
+        else:
+            digest = hashlib.sha256(body).hexdigest()
+            if entry and entry["digest"] == digest:
+                # No validators from the server, but the bytes are the same
+                _counters["unchanged_body"] += 1
+                data = entry["data"]
+            else:
+                data = {**await parse_html_async(body), "scraped_at": datetime.utcnow().isoformat()}
+    except Exception as e:
+        _counters["errors"] += 1
+        if entry:
+            _counters["stale_served"] += 1
+            return entry["data"]
+        return {
+            "error": f"Failed to scrape website: {str(e) or e.__class__.__name__}",
+            "scraped_at": datetime.utcnow().isoformat()
+        }
+
+    # A 304 may omit validators it did not change
+    await page_cache.set(key, {
+        "data": data,
+        "etag": response.headers.get("etag") or (entry or {}).get("etag"),
+        "last_modified": response.headers.get("last-modified") or (entry or {}).get("last_modified"),
+        "digest": digest,
+        "checked_at": time.time(),
+    })
+    return data
+
+
+def stats() -> Dict[str, Any]:
+    return {"parser": PARSER, **_counters, "robots": _robots.stats(), "cache": page_cache.stats()}
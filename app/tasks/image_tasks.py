@@ -43,7 +43,7 @@ def generate_image(self, job_id: str):
         job.status = models.JobStatus.PROCESSING
         self.db.commit()
         
-        # Call image generation service
+        # Call image generation service (reuses this worker's pooled HTTP clients)
         image_data = image_generation_service.generate_image(
             prompt=job.prompt_used,
             style_params={}  # Could extract from prompt or session
@@ -53,11 +53,13 @@ def generate_image(self, job_id: str):
         generated_image = models.GeneratedImage(
             session_id=job.session_id,
             job_id=job.id,
+            idea_id=job.idea_id,
+            variation_index=job.variation_index,
             image_url=image_data["url"],
             thumbnail_url=image_data.get("thumbnail_url"),
             prompt_used=job.prompt_used,
             analysis=image_data.get("analysis"),
-            metadata=image_data.get("metadata", {})
+            image_metadata=image_data.get("metadata", {})
         )
         self.db.add(generated_image)
         
@@ -112,11 +114,13 @@ def edit_image(self, job_id: str, source_image_id: str, source_url: str, edit_in
         edited_image = models.GeneratedImage(
             session_id=job.session_id,
             job_id=job.id,
+            idea_id=job.idea_id,
+            variation_index=job.variation_index,
             image_url=edited_image_data["url"],
             thumbnail_url=edited_image_data.get("thumbnail_url"),
             prompt_used=job.prompt_used,
             analysis=edited_image_data.get("analysis"),
-            metadata=edited_image_data.get("metadata", {}),
+            image_metadata=edited_image_data.get("metadata", {}),
             parent_image_id=source_image_id,
             edit_instructions=edit_instructions
         )
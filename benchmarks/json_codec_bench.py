@@ -0,0 +1,88 @@
+"""
+Micro-benchmark: stdlib json vs app.core.json_codec on the payloads we store
+and return (research_data, final_prompts / ideas, a long chat log).
+
+Run from the repository root:
+
+    python -m benchmarks.json_codec_bench [--number 2000]
+"""
+import argparse
+import asyncio
+import json
+import random
+import timeit
+from datetime import datetime
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.core import json_codec
+from app.schemas.advertising_schemas import AdCustomizationOptions
+from app.services import ad_generation_service, research_service
+
+
+def build_payloads():
+    random.seed(7)
+    product_info = {
+        "product_name": "Eco-friendly Water Bottle",
+        "product_type": "water bottle",
+        "company_name": "HydroLeaf",
+        "advertising_focus": "product",
+        "offer_details": None,
+        "business_type": "consumer goods",
+        "business_location": "Portland, OR",
+        "target_location": "US West Coast",
+        "target_demographic": "outdoor enthusiasts",
+        "target_age_group": "25-40",
+    }
+
+    async def research():
+        return {
+            "market_trends": await research_service.analyze_market_trends(product_info),
+            "competitor_analysis": await research_service.analyze_competitor_landscape(product_info),
+            "website_data": {
+                "title": "HydroLeaf - Bottles that grow with you",
+                "description": "Plant-based, plastic-free bottles for every adventure.",
+                "content_sample": ("Stay hydrated on the trail with our plant-based bottles. " * 40)[:2000],
+                "scraped_at": datetime.utcnow().isoformat(),
+            },
+            "research_timestamp": datetime.utcnow().isoformat(),
+            "product_info": product_info,
+        }
+
+    research_data = asyncio.run(research())
+    ideas = ad_generation_service.generate_ad_ideas(product_info, research_data, AdCustomizationOptions())
+    final_prompts = [idea.model_dump() for idea in ideas] * 3
+    chat_log = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i}: " + "lorem ipsum dolor " * 8}
+        for i in range(200)
+    ]
+    return {"research_data": research_data, "final_prompts": final_prompts, "chat_log (200 msgs)": chat_log}
+
+
+def bench(func, number):
+    # Best of 5 repeats, in microseconds per call
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000, help="calls per repeat")
+    args = parser.parse_args()
+
+    print(f"codec backend: {json_codec.BACKEND}\n")
+    print(f"{'payload':<22}{'op':<10}{'size':>8}{'stdlib µs':>12}{'codec µs':>12}{'speedup':>10}")
+    for name, payload in build_payloads().items():
+        encoded = json.dumps(payload)
+        cases = {
+            "dumps": (lambda: json.dumps(payload), lambda: json_codec.dumps(payload)),
+            "loads": (lambda: json.loads(encoded), lambda: json_codec.loads(encoded)),
+            "response": (lambda: JSONResponse(payload).body, lambda: ORJSONResponse(payload).body),
+        }
+        for op, (stdlib_call, codec_call) in cases.items():
+            stdlib_us = bench(stdlib_call, args.number)
+            codec_us = bench(codec_call, args.number)
+            print(f"{name:<22}{op:<10}{len(encoded):>8}{stdlib_us:>12.1f}{codec_us:>12.1f}{stdlib_us / codec_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -179,8 +179,9 @@ const AdCard: React.FC<AdCardProps> = ({
           <div className="w-20 h-20 flex-shrink-0">
             {ad.status === 'completed' && !imageError ? (
               <img
-                src={ad.image_url}
+                src={ad.renditions?.thumb || ad.thumbnail_url || ad.image_url}
                 alt="Generated ad"
+                loading="lazy"
                 className="w-full h-full object-cover rounded-lg"
                 onLoad={() => setImageLoaded(true)}
                 onError={() => setImageError(true)}
@@ -251,8 +252,9 @@ const AdCard: React.FC<AdCardProps> = ({
         {ad.status === 'completed' && !imageError ? (
           <div className="relative">
             <img
-              src={ad.image_url}
+              src={ad.renditions?.preview || ad.thumbnail_url || ad.image_url}
               alt="Generated ad"
+              loading="lazy"
               className="w-full h-48 object-cover rounded-xl"
               onLoad={() => setImageLoaded(true)}
               onError={() => setImageError(true)}
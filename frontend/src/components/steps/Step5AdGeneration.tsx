@@ -17,19 +17,13 @@ const Step5AdGeneration: React.FC<Step5Props> = ({ data, onPrev, isLoading, setI
   const [selectedImage, setSelectedImage] = useState<GeneratedAd | null>(null);
 
   useEffect(() => {
-    if (jobIds.length > 0) {
-      const intervalId = setInterval(() => {
-        jobIds.forEach(async (jobId) => {
-          if (!generationStatus[jobId] || generationStatus[jobId].status !== 'completed') {
-            const status = await apiService.checkAdStatus(jobId);
-            setGenerationStatus((prev) => ({ ...prev, [jobId]: status }));
-          }
-        });
-      }, 5000);
-
-      return () => clearInterval(intervalId);
-    }
-  }, [jobIds, generationStatus]);
+    if (jobIds.length === 0 || !data.sessionId) return;
+
+    // The server pushes each job's transitions, so there is no per-job polling
+    return apiService.streamAdStatus(data.sessionId, jobIds, (status) => {
+      setGenerationStatus((prev) => ({ ...prev, [status.job_id]: status }));
+    });
+  }, [jobIds, data.sessionId]);
 
   const generateAds = async () => {
     if (!data.sessionId || !data.selectedIdeas || data.selectedIdeas.length === 0) return;
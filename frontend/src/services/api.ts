@@ -312,6 +312,26 @@ export const apiService = {
     const response = await api.get(`/ad-status/${jobId}`);
     return response.data;
   },
+
+  // Subscribe to pushed status updates for a batch of jobs (server-sent events).
+  // Returns a function that closes the stream.
+  streamAdStatus: (
+    sessionId: string,
+    jobIds: string[],
+    onStatus: (status: AdGenerationStatus) => void,
+    onDone?: () => void
+  ): (() => void) => {
+    const url = `${API_BASE_URL}/ad-status/stream/${sessionId}?job_ids=${encodeURIComponent(jobIds.join(','))}`;
+    const source = new EventSource(url);
+    source.addEventListener('job_status', (event) => {
+      onStatus(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('done', () => {
+      source.close();
+      onDone?.();
+    });
+    return () => source.close();
+  },
 };
 
 export default api;
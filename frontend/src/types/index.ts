@@ -44,6 +44,7 @@ export interface GeneratedAd {
   // Additional properties for extended API compatibility
   ad_id?: string;
   thumbnail_url?: string;
+  renditions?: Record<string, string>; // e.g. thumb, preview, meta_feed
   prompt_used?: string;
   performance_prediction?: Record<string, number>;
 }
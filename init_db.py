@@ -1,14 +1,15 @@
 import logging
-from app.core.database import engine, Base
-from app.models import models  # Ensure all models are imported
+from app.core.database import engine
+from app.core import migrations
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_db():
     logger.info("Creating database tables...")
-    # This line creates the tables based on all classes that inherit from Base
-    Base.metadata.create_all(bind=engine)
+    # Creates the tables based on all classes that inherit from Base, then
+    # upgrades existing tables (new columns, indexes, backfills)
+    migrations.upgrade(engine)
     logger.info("Database tables created successfully.")
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 import axios, { AxiosError } from 'axios';
-import { PromptStartResponse, ChatResponse, GenerateAdsRequest, AdGenerationStatus, GenerateAdsResponse } from '../types';
+import { PromptStartResponse, ChatResponse, ChatHistoryResponse, GenerateAdsRequest, AdGenerationStatus, GenerateAdsResponse } from '../types';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api/v1';
 
@@ -28,8 +28,13 @@ export const apiClient = {
     return response.data;
   },
 
-  async chat(sessionId: string, message: string): Promise<ChatResponse> {
-    const response = await api.post('/chat', { session_id: sessionId, message });
+  async chat(sessionId: string, message: string, cursor?: number): Promise<ChatResponse> {
+    const response = await api.post('/chat', { session_id: sessionId, message, cursor });
+    return response.data;
+  },
+
+  async getChatHistory(sessionId: string, before?: number, limit = 50): Promise<ChatHistoryResponse> {
+    const response = await api.get(`/chat/${sessionId}/history`, { params: { before, limit } });
     return response.data;
   },
 
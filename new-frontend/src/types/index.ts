@@ -2,22 +2,33 @@
 export interface PromptStartResponse {
   session_id: string;
   extracted_keywords: string[];
+  keyword_scores?: Record<string, number>;
+  keyword_source?: 'spacy' | 'regex';
   questions: string[];
 }
 
 export interface ChatMessage {
   role: 'user' | 'assistant';
   content: string;
+  sequence?: number;
 }
 
 export interface ChatResponse {
   session_id: string;
   response: string;
   stage: ConversationStage;
-  conversation_history: ChatMessage[];
+  messages: ChatMessage[]; // only messages after the cursor sent with the request
+  cursor: number; // sequence of the last message returned
+  has_more: boolean; // catch-up was capped; page on via /chat/{session_id}/history?after=cursor
   ideas?: AdIdea[];
 }
 
+export interface ChatHistoryResponse {
+  session_id: string;
+  messages: ChatMessage[];
+  has_more: boolean;
+}
+
 export enum ConversationStage {
   GATHERING_INFO = 'gathering_info',
   AWAITING_PREFERENCES = 'awaiting_preferences',